@@ -6,3 +6,6 @@ class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
     verbose_name = 'Приложение "api"'
+
+    def ready(self):
+        from . import signals  # noqa: F401
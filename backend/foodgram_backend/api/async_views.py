@@ -0,0 +1,167 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import HttpResponse
+from django.utils.translation import gettext_lazy as _
+from rest_framework import HTTP_HEADER_ENCODING, status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import (APIException, AuthenticationFailed,
+                                       MethodNotAllowed, NotAuthenticated,
+                                       NotFound)
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingList
+from users.models import Follow, User
+
+from .relations import add_relation, remove_relation
+from .renderers import ORJSONRenderer
+from .serializers import RecipeLightSerializer, SubscriptionSerializer
+
+TOGGLE_METHODS = ('POST', 'DELETE')
+
+
+def json_response(data, status_code):
+    return HttpResponse(
+        ORJSONRenderer().render(data),
+        content_type='application/json',
+        status=status_code,
+    )
+
+
+def error_response(exception):
+    """Ответ в формате обработчика исключений DRF."""
+    response = json_response(
+        {'detail': exception.detail}, exception.status_code,
+    )
+    if isinstance(exception, (NotAuthenticated, AuthenticationFailed)):
+        response['WWW-Authenticate'] = TokenAuthentication.keyword
+    elif isinstance(exception, MethodNotAllowed):
+        response['Allow'] = ', '.join(TOGGLE_METHODS)
+    return response
+
+
+async def authenticate(request):
+    """Асинхронный аналог TokenAuthentication."""
+    auth = request.META.get('HTTP_AUTHORIZATION', '')
+    auth = auth.encode(HTTP_HEADER_ENCODING).split()
+    keyword = TokenAuthentication.keyword.lower().encode()
+    if not auth or auth[0].lower() != keyword:
+        raise NotAuthenticated()
+    if len(auth) == 1:
+        raise AuthenticationFailed(
+            _('Invalid token header. No credentials provided.')
+        )
+    if len(auth) > 2:
+        raise AuthenticationFailed(_(
+            'Invalid token header. Token string should not contain spaces.'
+        ))
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        raise AuthenticationFailed(_(
+            'Invalid token header. '
+            'Token string should not contain invalid characters.'
+        ))
+    try:
+        token = await Token.objects.select_related('user').aget(key=key)
+    except Token.DoesNotExist:
+        raise AuthenticationFailed(_('Invalid token.'))
+    if not token.user.is_active:
+        raise AuthenticationFailed(_('User inactive or deleted.'))
+    return token.user
+
+
+async def aget_object_or_404(queryset, pk):
+    try:
+        return await queryset.aget(pk=pk)
+    except ObjectDoesNotExist:
+        raise NotFound()
+
+
+def async_toggle_view(view):
+    """
+    POST и DELETE только для пользователя с токеном,
+    ошибки API - в том же виде, что у ViewSet.
+    """
+    @wraps(view)
+    async def wrapper(request, pk):
+        try:
+            request.user = await authenticate(request)
+            if request.method not in TOGGLE_METHODS:
+                raise MethodNotAllowed(request.method)
+            return await view(request, pk)
+        except APIException as exception:
+            return error_response(exception)
+
+    # Токен не хранится в cookie, поэтому CSRF не нужен - как и в DRF.
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+async def toggle_recipe(request, pk, model):
+    """Асинхронный RecipeViewSet.create_delete_or_scold."""
+    if request.method == 'DELETE':
+        if not await sync_to_async(remove_relation)(
+            model, recipe_id=pk, user=request.user,
+        ):
+            if not await Recipe.objects.filter(id=pk).aexists():
+                raise NotFound()
+            content = {
+                'errors': 'Этого рецепта нет в вашем списке.'
+            }
+            return json_response(content, status.HTTP_400_BAD_REQUEST)
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+
+    recipe = await aget_object_or_404(Recipe.objects.all(), pk)
+    if await sync_to_async(add_relation)(
+        model, user_id=request.user.pk, recipe_id=recipe.pk,
+    ) is None:
+        content = {
+            'errors': 'Этот рецепт уже был в вашем списке.'
+        }
+        return json_response(content, status.HTTP_400_BAD_REQUEST)
+    serializer = RecipeLightSerializer(recipe, context={'request': request})
+    return json_response(serializer.data, status.HTTP_201_CREATED)
+
+
+@async_toggle_view
+async def favorite(request, pk):
+    return await toggle_recipe(request, pk, FavoriteRecipe)
+
+
+@async_toggle_view
+async def shopping_cart(request, pk):
+    return await toggle_recipe(request, pk, ShoppingList)
+
+
+@async_toggle_view
+async def subscribe(request, pk):
+    """Асинхронный UserViewSet.subscribe."""
+    follower = request.user
+    if request.method == 'DELETE':
+        if not await sync_to_async(remove_relation)(
+            Follow, user=follower, author_id=pk,
+        ):
+            if not await User.objects.filter(id=pk).aexists():
+                raise NotFound()
+            content = {'errors': 'У вас не такой подписки'}
+            return json_response(content, status.HTTP_400_BAD_REQUEST)
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+
+    followed = await aget_object_or_404(User.objects.all(), pk)
+    if followed == follower:
+        content = {'errors': 'Нельзя подписаться самого себя'}
+        return json_response(content, status.HTTP_400_BAD_REQUEST)
+    if await sync_to_async(add_relation)(
+        Follow, user_id=follower.pk, author_id=followed.pk,
+    ) is None:
+        content = {'errors': 'Вы уже подписаны на данного автора'}
+        return json_response(content, status.HTTP_400_BAD_REQUEST)
+    followed.is_subscribed = True
+    serializer = SubscriptionSerializer(
+        followed, context={'request': request, 'user': follower},
+    )
+    # Рецепты автора читаются синхронным ORM.
+    data = await sync_to_async(lambda: serializer.data)()
+    return json_response(data, status.HTTP_201_CREATED)
@@ -1,45 +1,82 @@
 
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+from rest_framework.settings import api_settings
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import FavoriteRecipe, Recipe, ShoppingList, Tag
+from recipes.search import get_search_backend
+from recipes.signals import REFERENCE_DATA_VERSION
+from utils.cache import get_version
+from utils.constants import REFERENCE_DATA_MAX_AGE
+
+
+def get_tag_ids():
+    """Словарь slug -> id тегов из кэша текущей версии справочников."""
+    return cache.get_or_set(
+        f'tags:ids:{get_version(REFERENCE_DATA_VERSION)}',
+        lambda: dict(Tag.objects.values_list('slug', 'pk')),
+        REFERENCE_DATA_MAX_AGE,
+    )
+
+
+def get_tag_choices():
+    return [(slug, slug) for slug in get_tag_ids()]
 
 
 class RecipeFilter(filters.FilterSet):
-    """Фильтры для Recipe."""
+    """
+    Фильтры для Recipe. Каждый фильтр - условие по индексу
+    или подзапрос EXISTS, поэтому они свободно комбинируются
+    без JOIN и DISTINCT.
+    """
 
-    author = filters.CharFilter(
-        lookup_expr='exact',
+    author = filters.NumberFilter(
+        field_name='author_id',
         label='author',
     )
-    tags = filters.filters.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug',
-        lookup_expr='icontains',
+    tags = filters.MultipleChoiceFilter(
+        choices=get_tag_choices,
+        method='get_tags',
         label='tags',
     )
     is_favorited = filters.BooleanFilter(
         method='get_favorite',
-        lookup_expr='icontains',
         label='is_favorite',
-        field_name='is_favorited',
     )
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_shopping_cart',
-        lookup_expr='icontains',
         label='shopping_cart',
-        field_name='is_in_shopping_cart',
     )
 
+    def get_tags(self, queryset, name, value):
+        """Слаг, удалённый после валидации, просто не даёт совпадений."""
+        tag_ids = get_tag_ids()
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe_id=OuterRef('pk'),
+                tag_id__in=[
+                    tag_ids[slug] for slug in value if slug in tag_ids
+                ],
+            )
+        ))
+
+    def filter_by_user(self, queryset, model, value):
+        if not value:
+            return queryset
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.none()
+        return queryset.filter(Exists(
+            model.objects.filter(recipe_id=OuterRef('pk'), user_id=user.pk)
+        ))
+
     def get_favorite(self, queryset, name, value):
-        if value:
-            return queryset.filter(favorite_recipe__user=self.request.user)
+        return self.filter_by_user(queryset, FavoriteRecipe, value)
 
     def get_shopping_cart(self, queryset, name, value):
-        if value:
-            return Recipe.objects.filter(
-                shopping_list__user=self.request.user
-            )
+        return self.filter_by_user(queryset, ShoppingList, value)
 
     class Meta:
         model = Recipe
@@ -50,14 +87,19 @@ class RecipeFilter(filters.FilterSet):
         )
 
 
-class IngredientFilter(filters.FilterSet):
-    """Фильтр для Ingredient."""
+class RecipeSearchFilter(BaseFilterBackend):
+    """
+    Полнотекстовый поиск рецептов через поисковый бэкенд.
+    Без явного ordering результаты сортируются по релевантности.
+    """
 
-    name = filters.CharFilter(
-        field_name='name',
-        lookup_expr='istartswith',
-    )
+    search_param = api_settings.SEARCH_PARAM
 
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        queryset = get_search_backend().search(queryset, query)
+        if request.query_params.get(OrderingFilter.ordering_param):
+            return queryset
+        return queryset.order_by('-search_rank', *queryset.query.order_by)
@@ -0,0 +1,88 @@
+import threading
+from bisect import bisect_left, bisect_right
+
+from recipes.models import Ingredient
+from recipes.signals import REFERENCE_DATA_VERSION
+from utils.cache import get_version
+from utils.text import normalize
+
+
+class IngredientIndex:
+    """Отсортированный в памяти индекс названий ингредиентов."""
+
+    def __init__(self, ingredients):
+        entries = sorted(
+            (normalize(item['name']), item['id'], item)
+            for item in ingredients
+        )
+        self.keys = [key for key, _, _ in entries]
+        self.items = [item for _, _, item in entries]
+        self.haystack = '\n'.join(self.keys)
+        self.offsets = []
+        offset = 0
+        for key in self.keys:
+            self.offsets.append(offset)
+            offset += len(key) + 1
+
+    def find_substrings(self, query):
+        """
+        Ищет подстроку сразу во всех названиях через str.find;
+        результат упорядочен по позиции совпадения, затем по названию.
+        """
+        found = []
+        position = self.haystack.find(query)
+        while position != -1:
+            index = bisect_right(self.offsets, position) - 1
+            start = position - self.offsets[index]
+            if start:
+                found.append((start, self.keys[index], index))
+            if index + 1 == len(self.offsets):
+                break
+            position = self.haystack.find(query, self.offsets[index + 1])
+        return sorted(found)
+
+    def search(self, query, limit=None):
+        """
+        Сначала совпадения по началу названия по алфавиту, затем
+        по подстроке: чем ближе к началу совпадение, тем выше,
+        при равной позиции - по алфавиту.
+        """
+        query = normalize(query.strip())
+        if not query:
+            return self.items[:limit]
+        start = bisect_left(self.keys, query)
+        end = start
+        while end < len(self.keys) and self.keys[end].startswith(query):
+            end += 1
+        result = self.items[start:end]
+        if limit is not None and len(result) >= limit:
+            return result[:limit]
+        result.extend(
+            self.items[index] for _, _, index in self.find_substrings(query)
+        )
+        return result[:limit]
+
+
+class IngredientIndexHolder:
+    """Хранит индекс процесса и перестраивает его при смене версии."""
+
+    def __init__(self):
+        self.index = None
+        self.version = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        version = get_version(REFERENCE_DATA_VERSION)
+        if self.index is None or self.version != version:
+            with self.lock:
+                if self.index is None or self.version != version:
+                    self.index = IngredientIndex(
+                        Ingredient.objects.values(
+                            'id', 'name', 'measurement_unit'
+                        )
+                    )
+                    self.version = version
+        return self.index
+
+
+ingredient_index = IngredientIndexHolder()
@@ -0,0 +1,726 @@
+import base64
+import io
+import json
+import shutil
+import tempfile
+import time
+from itertools import product
+from pathlib import Path
+
+import yaml
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import update_last_login
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Prefetch
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from jsonschema import RefResolver, validate
+from jsonschema.exceptions import ValidationError
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from recipes.counters import rebuild_counters
+from recipes.feed import backfill_feed
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingList, Tag)
+from recipes.search import update_search_documents
+from users.models import Follow, User
+from utils import background
+from utils.cache import bump_version, get_versions
+
+from ...renderers import ORJSONRenderer
+from ...serializers import CARD_FIELDS, RecipeSerializer, build_recipe_cards
+from ...signals import (RECIPE_COUNTS_VERSION, USER_COUNTS_VERSION,
+                        VIEWER_COUNTS_VERSION)
+
+BUDGET_FILE = Path(__file__).resolve().parents[2] / 'query_budget.json'
+SCHEMA_FILE = settings.BASE_DIR.parents[1] / 'docs' / 'openapi-schema.yml'
+
+SEED_USERS: int = 40
+SEED_TAGS: int = 3
+SEED_INGREDIENTS: int = 300
+SEED_RECIPES: int = 120
+INGREDIENTS_PER_RECIPE: int = 6
+SMALL_PAGE: int = 6
+LARGE_PAGE: int = 30
+PASSWORD: str = 'Bench-Password-2023'
+LOCAL_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+NEW_PASSWORD: str = 'Bench-Password-2024'
+CARD_BENCH_ROUNDS: int = 20
+# Страницы, на которых карточки рецептов сверяются с RecipeSerializer.
+CARD_CONTRACT_URLS = (
+    '/api/recipes/?limit={limit}',
+    '/api/recipes/?limit={limit}&is_favorited=1',
+    '/api/recipes/?limit={limit}&author={author}',
+)
+
+# Эндпоинты, в запросах которых к таблице рецептов не должно быть
+# JOIN и DISTINCT: фильтры, поиск и сортировка - только EXISTS и индексы.
+FLAT_RECIPE_ENDPOINTS = (
+    'recipes-list', 'recipes-list-filtered', 'recipes-search',
+    'recipes-list-cursor', 'recipes-feed',
+)
+RECIPE_TABLE_SQL: str = 'FROM "recipes_recipe"'
+# Эндпоинты, которые замеряются повторным запросом с включённым кэшем
+# ответов. Остальные замеряются без него.
+RESPONSE_CACHED_ENDPOINTS = (
+    'recipes-list-response-cached', 'recipes-detail-response-cached',
+    'users-detail-response-cached',
+)
+FORBIDDEN_RECIPE_SQL = ('JOIN', 'DISTINCT')
+
+# (имя, метод, url, ожидаемый статус, зависит ли от размера страницы)
+ENDPOINTS = (
+    ('auth-token-login', 'post', '/api/auth/token/login/', 200, False),
+    ('users-list', 'get', '/api/users/?limit={limit}', 200, True),
+    ('users-create', 'post', '/api/users/', 201, False),
+    ('users-detail', 'get', '/api/users/{author}/', 200, False),
+    (
+        'users-detail-response-cached', 'get', '/api/users/{author}/', 200,
+        False,
+    ),
+    ('users-me', 'get', '/api/users/me/', 200, False),
+    (
+        'users-subscriptions', 'get',
+        '/api/users/subscriptions/?limit={limit}&recipes_limit=3',
+        200, True,
+    ),
+    (
+        'users-subscriptions-cursor', 'get',
+        '/api/users/subscriptions/?pagination=cursor&limit={limit}',
+        200, True,
+    ),
+    ('users-subscribe', 'post', '/api/users/{stranger}/subscribe/', 201,
+     False),
+    ('users-unsubscribe', 'delete', '/api/users/{stranger}/subscribe/', 204,
+     False),
+    ('tags-list', 'get', '/api/tags/', 200, False),
+    ('tags-detail', 'get', '/api/tags/{tag}/', 200, False),
+    ('ingredients-list', 'get', '/api/ingredients/', 200, False),
+    ('ingredients-search', 'get', '/api/ingredients/?name={prefix}', 200,
+     False),
+    ('ingredients-detail', 'get', '/api/ingredients/{ingredient}/', 200,
+     False),
+    ('recipes-list', 'get', '/api/recipes/?limit={limit}', 200, True),
+    (
+        'recipes-list-filtered', 'get',
+        '/api/recipes/?limit={limit}&tags={tag_slug}&tags={other_tag_slug}'
+        '&is_favorited=1&is_in_shopping_cart=1',
+        200, True,
+    ),
+    (
+        'recipes-search', 'get',
+        '/api/recipes/?limit={limit}&search=рецептов ингредиента', 200,
+        True,
+    ),
+    (
+        'recipes-list-cursor', 'get',
+        '/api/recipes/?pagination=cursor&limit={limit}', 200, True,
+    ),
+    ('recipes-feed', 'get', '/api/recipes/feed/?limit={limit}', 200, True),
+    ('recipes-detail', 'get', '/api/recipes/{recipe}/', 200, False),
+    (
+        'recipes-list-response-cached', 'get', '/api/recipes/?limit={limit}',
+        200, False,
+    ),
+    (
+        'recipes-detail-response-cached', 'get', '/api/recipes/{recipe}/',
+        200, False,
+    ),
+    ('recipes-create', 'post', '/api/recipes/', 201, False),
+    ('recipes-patch', 'patch', '/api/recipes/{new_recipe}/', 200, False),
+    ('recipes-patch-text', 'patch', '/api/recipes/{new_recipe}/', 200,
+     False),
+    ('recipes-favorite', 'post', '/api/recipes/{new_recipe}/favorite/', 201,
+     False),
+    ('recipes-unfavorite', 'delete', '/api/recipes/{new_recipe}/favorite/',
+     204, False),
+    (
+        'recipes-shopping-cart', 'post',
+        '/api/recipes/{new_recipe}/shopping_cart/', 201, False,
+    ),
+    (
+        'recipes-shopping-cart-remove', 'delete',
+        '/api/recipes/{new_recipe}/shopping_cart/', 204, False,
+    ),
+    (
+        'recipes-download-shopping-cart', 'get',
+        '/api/recipes/download_shopping_cart/', 200, False,
+    ),
+    (
+        'recipes-download-shopping-cart-cached', 'get',
+        '/api/recipes/download_shopping_cart/', 200, False,
+    ),
+    (
+        'recipes-download-shopping-cart-not-modified', 'get',
+        '/api/recipes/download_shopping_cart/', 304, False,
+    ),
+    (
+        'recipes-download-shopping-cart-txt', 'get',
+        '/api/recipes/download_shopping_cart/?format=txt', 200, False,
+    ),
+    (
+        'recipes-download-shopping-cart-csv', 'get',
+        '/api/recipes/download_shopping_cart/?format=csv', 200, False,
+    ),
+    (
+        'recipes-download-shopping-cart-json', 'get',
+        '/api/recipes/download_shopping_cart/?format=json', 200, False,
+    ),
+    ('recipes-favorite-bulk', 'post', '/api/recipes/favorite/', 200, False),
+    ('recipes-unfavorite-bulk', 'delete', '/api/recipes/favorite/', 200,
+     False),
+    (
+        'recipes-shopping-cart-bulk', 'post',
+        '/api/recipes/shopping_cart/', 200, False,
+    ),
+    (
+        'recipes-shopping-cart-bulk-remove', 'delete',
+        '/api/recipes/shopping_cart/', 200, False,
+    ),
+    ('recipes-delete', 'delete', '/api/recipes/{new_recipe}/', 204, False),
+    ('users-set-password', 'post', '/api/users/set_password/', 204, False),
+    ('auth-token-logout', 'post', '/api/auth/token/logout/', 204, False),
+)
+
+
+def make_image():
+    """Возвращает небольшую PNG-картинку в байтах."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), color='orange').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    """Бенчмарк и контроль бюджета SQL-запросов для всех эндпоинтов /api/."""
+
+    help = (
+        'Заполняет тестовую БД, вызывает все эндпоинты /api/ и сверяет '
+        'количество SQL-запросов с бюджетом из query_budget.json.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--update',
+            action='store_true',
+            help='Перезаписать бюджет текущими значениями.',
+        )
+        parser.add_argument(
+            '--budget',
+            default=str(BUDGET_FILE),
+            help='Путь к файлу бюджета.',
+        )
+
+    def handle(self, *args, **options):
+        budget_path = Path(options['budget'])
+        budget = {}
+        if budget_path.exists():
+            budget = json.loads(budget_path.read_text(encoding='utf-8'))
+
+        media_root = tempfile.mkdtemp(prefix='apibench-')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True,
+        )
+        try:
+            with override_settings(
+                MEDIA_ROOT=media_root, CACHES=LOCAL_CACHES,
+                RESPONSE_CACHE_ENABLED=False,
+            ):
+                results = self.run_benchmark()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        if options['update']:
+            self.write_budget(budget_path, budget, results)
+            return
+        self.check_budget(budget, results)
+
+    def seed(self):
+        """Создаёт реалистичный набор данных для замеров."""
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            User(
+                email=f'user{index}@foodgram.ru',
+                username=f'user{index}',
+                first_name=f'Имя{index}',
+                last_name=f'Фамилия{index}',
+                password=password,
+            )
+            for index in range(SEED_USERS)
+        )
+        users = list(User.objects.order_by('pk'))
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'tag{index}', color=f'#{index:06d}', slug=f'tag{index}')
+            for index in range(SEED_TAGS)
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {index}', measurement_unit='г')
+            for index in range(SEED_INGREDIENTS)
+        )
+        ingredients = list(Ingredient.objects.order_by('pk'))
+        image = default_storage.save(
+            'recipes/bench.png', ContentFile(make_image()),
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                name=f'Рецепт {index}',
+                author=users[index % (SEED_USERS // 2)],
+                image=image,
+                text='Описание рецепта. ' * 20,
+                cooking_time=10 + index,
+            )
+            for index in range(SEED_RECIPES)
+        )
+        recipes = list(Recipe.objects.order_by('pk'))
+        Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes[::3]])\
+            .update(image_variants={
+                'source': image,
+                'thumbnail': {
+                    'jpeg': 'recipes/variants/bench_thumbnail.jpeg',
+                    'webp': 'recipes/variants/bench_thumbnail.webp',
+                },
+            })
+        RecipeTag = Recipe.tags.through
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag=tags[index % SEED_TAGS])
+            for index, recipe in enumerate(recipes)
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=ingredients[
+                    (index * INGREDIENTS_PER_RECIPE + offset)
+                    % SEED_INGREDIENTS
+                ],
+                amount=offset + 1,
+            )
+            for index, recipe in enumerate(recipes)
+            for offset in range(INGREDIENTS_PER_RECIPE)
+        )
+        update_search_documents(recipe.pk for recipe in recipes)
+        reader = users[-1]
+        authors = users[:SEED_USERS // 2]
+        Follow.objects.bulk_create(
+            Follow(user=reader, author=author) for author in authors
+        )
+        for author in authors:
+            backfill_feed(reader.pk, author.pk)
+        FavoriteRecipe.objects.bulk_create(
+            FavoriteRecipe(user=reader, recipe=recipe)
+            for recipe in recipes[::2]
+        )
+        ShoppingList.objects.bulk_create(
+            ShoppingList(user=reader, recipe=recipe)
+            for recipe in recipes[:LARGE_PAGE]
+        )
+        rebuild_counters()
+        return {
+            'reader': reader,
+            'author': authors[0].pk,
+            'stranger': users[-2].pk,
+            'tag': tags[0].pk,
+            'tag_ids': [tag.pk for tag in tags],
+            'tag_slug': tags[0].slug,
+            'other_tag_slug': tags[1].slug,
+            'ingredient': ingredients[0].pk,
+            'ingredient_ids': [item.pk for item in ingredients[:3]],
+            'prefix': 'ингр',
+            'recipe': recipes[0].pk,
+            # Половина из них в избранном, в корзине - ни одного.
+            'bulk_ids': [
+                recipe.pk for recipe in recipes[LARGE_PAGE:2 * LARGE_PAGE]
+            ],
+        }
+
+    def get_payload(self, name, context):
+        image = 'data:image/png;base64,' + base64.b64encode(
+            make_image()
+        ).decode()
+        payloads = {
+            'auth-token-login': {
+                'email': context['reader'].email,
+                'password': PASSWORD,
+            },
+            'users-create': {
+                'email': 'new@foodgram.ru',
+                'username': 'newcomer',
+                'first_name': 'Новый',
+                'last_name': 'Пользователь',
+                'password': PASSWORD,
+            },
+            'users-set-password': {
+                'current_password': PASSWORD,
+                'new_password': NEW_PASSWORD,
+            },
+            'recipes-create': {
+                'name': 'Новый рецепт',
+                'text': 'Описание',
+                'cooking_time': 15,
+                'image': image,
+                'tags': context['tag_ids'],
+                'ingredients': [
+                    {'id': pk, 'amount': 10}
+                    for pk in context['ingredient_ids']
+                ],
+            },
+            'recipes-patch': {
+                'name': 'Обновлённый рецепт',
+                'text': 'Новое описание',
+                'cooking_time': 20,
+                'image': image,
+                'tags': context['tag_ids'],
+                'ingredients': [
+                    {'id': pk, 'amount': 5}
+                    for pk in context['ingredient_ids'][1:]
+                ],
+            },
+            'recipes-patch-text': {'text': 'Только новое описание'},
+        }
+        if name.endswith(('-bulk', '-bulk-remove')):
+            return {'ids': context['bulk_ids']}
+        return payloads.get(name)
+
+    def get_headers(self, name, context):
+        if name == 'recipes-download-shopping-cart-not-modified':
+            return {'HTTP_IF_NONE_MATCH': context['cart_etag']}
+        return {}
+
+    def call(self, client, method, url, payload, headers):
+        """Выполняет запрос и возвращает ответ и метрики."""
+        sql_time = 0.0
+
+        def timer(execute, sql, params, many, context):
+            nonlocal sql_time
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                sql_time += time.perf_counter() - started
+
+        with CaptureQueriesContext(connection) as queries, \
+                connection.execute_wrapper(timer):
+            started = time.perf_counter()
+            response = getattr(client, method)(
+                url, payload, format='json', **headers,
+            )
+            if response.streaming:
+                b''.join(response.streaming_content)
+            wall_time = time.perf_counter() - started
+        return response, {
+            'queries': len(queries),
+            'sql': [query['sql'] for query in queries.captured_queries],
+            'sql_ms': sql_time * 1000,
+            'wall_ms': wall_time * 1000,
+        }
+
+    def call_cached(self, client, method, url, payload, headers):
+        """Второй из двух одинаковых запросов должен попасть в кэш."""
+        with override_settings(RESPONSE_CACHE_ENABLED=True):
+            self.call(client, method, url, payload, headers)
+            response, metrics = self.call(
+                client, method, url, payload, headers,
+            )
+        if not response.get('X-Cache', '').startswith('HIT'):
+            raise CommandError(f'{url}: ответ не взят из кэша.')
+        return response, metrics
+
+    def run_benchmark(self):
+        context = self.seed()
+        token = Token.objects.create(user=context['reader'])
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        # Прогрев кэшей процесса: справочники, слаги тегов, индекс поиска.
+        client.get('/api/tags/')
+        client.get(f'/api/recipes/?tags={context["tag_slug"]}')
+        client.get('/api/recipes/?search=рецепт')
+
+        results = {}
+        for name, method, template, expected, scaled in ENDPOINTS:
+            payload = self.get_payload(name, context)
+            headers = self.get_headers(name, context)
+            if name == 'auth-token-logout':
+                client.credentials(
+                    HTTP_AUTHORIZATION=f'Token {context["login_token"]}'
+                )
+            if scaled:
+                # Оба замера - с холодным кэшем count.
+                self.reset_count_cache(context)
+                _, small = self.call(
+                    client, method,
+                    template.format(limit=SMALL_PAGE, **context), payload,
+                    headers,
+                )
+            url = template.format(limit=LARGE_PAGE, **context)
+            if scaled:
+                self.reset_count_cache(context)
+            if name in RESPONSE_CACHED_ENDPOINTS:
+                response, metrics = self.call_cached(
+                    client, method, url, payload, headers,
+                )
+            else:
+                response, metrics = self.call(
+                    client, method, url, payload, headers,
+                )
+            if response.status_code != expected:
+                raise CommandError(
+                    f'{name}: {method.upper()} {url} вернул '
+                    f'{response.status_code}, ожидался {expected}.'
+                )
+            metrics['grows'] = scaled and small['queries'] != metrics[
+                'queries'
+            ]
+            metrics['forbidden_sql'] = self.get_forbidden_sql(
+                name, metrics.pop('sql'),
+            )
+            results[name] = metrics
+            if name == 'recipes-create':
+                context['new_recipe'] = response.data['id']
+            elif name == 'auth-token-login':
+                context['login_token'] = response.data['auth_token']
+            elif name == 'recipes-download-shopping-cart':
+                context['cart_etag'] = response['ETag']
+        self.check_recipe_cards(context)
+        self.check_count_versions(context)
+        self.check_counter_saves(context)
+        self.benchmark_recipe_cards(context)
+        background.wait_all()
+        mismatches = rebuild_counters(fix=False)
+        if mismatches:
+            raise CommandError(
+                'Счётчики разошлись с данными: '
+                + ', '.join(
+                    f'{model._meta.label} {pk} {counter} '
+                    f'{stored} != {actual}'
+                    for model, pk, counter, stored, actual in mismatches
+                )
+            )
+        return results
+
+    @staticmethod
+    def reset_count_cache(context):
+        """Холодный кэш count списков и выборок читателя."""
+        bump_version(
+            RECIPE_COUNTS_VERSION, USER_COUNTS_VERSION,
+            VIEWER_COUNTS_VERSION.format(context['reader'].pk),
+        )
+
+    def check_count_versions(self, context):
+        """Вход и избранное читателя не сбрасывают общий кэш count."""
+        names = (RECIPE_COUNTS_VERSION, USER_COUNTS_VERSION)
+        versions = get_versions(*names)
+        update_last_login(None, context['reader'])
+        client = APIClient()
+        client.force_authenticate(context['reader'])
+        url = f'/api/recipes/{context["bulk_ids"][1]}/favorite/'
+        client.post(url)
+        client.delete(url)
+        if get_versions(*names) != versions:
+            raise CommandError(
+                'Вход или избранное сбросили кэш count списков.'
+            )
+
+    def check_counter_saves(self, context):
+        """
+        save() рецепта и автора, прочитанных до изменения избранного
+        и подписок, не возвращает старые значения счётчиков.
+        """
+        recipe = Recipe.objects.select_related('author').get(
+            pk=context['bulk_ids'][2],
+        )
+        stranger = User.objects.get(pk=context['stranger'])
+        client = APIClient()
+        client.force_authenticate(stranger)
+        client.post(f'/api/recipes/{recipe.pk}/favorite/')
+        client.post(f'/api/users/{recipe.author_id}/subscribe/')
+        recipe.save()
+        recipe.author.save()
+        client.delete(f'/api/recipes/{recipe.pk}/favorite/')
+        client.delete(f'/api/users/{recipe.author_id}/subscribe/')
+        if rebuild_counters(fix=False):
+            raise CommandError('save() затёр счётчики устаревшими значениями.')
+
+    @staticmethod
+    def serialize_recipes(recipe_ids, request):
+        """Эталон: RecipeSerializer на моделях и JSONRenderer DRF."""
+        user = request.user
+        recipes = {
+            recipe.pk: recipe for recipe in
+            Recipe.objects
+            .with_user_flags(user)
+            .filter(pk__in=recipe_ids)
+            .prefetch_related(
+                Prefetch(
+                    'author', queryset=User.objects.with_is_subscribed(user),
+                ),
+                'tags',
+                Prefetch(
+                    'recipeingredients',
+                    queryset=(
+                        RecipeIngredient.objects
+                        .select_related('ingredient')
+                        .order_by('pk')
+                    ),
+                ),
+            )
+        }
+        return JSONRenderer().render(RecipeSerializer(
+            [recipes[pk] for pk in recipe_ids], many=True,
+            context={'request': request},
+        ).data)
+
+    def check_recipe_cards(self, context):
+        """
+        Карточки рецептов байт в байт совпадают с ответом RecipeSerializer
+        и соответствуют схеме RecipeList из docs/openapi-schema.yml.
+        """
+        schema = None
+        if SCHEMA_FILE.exists():
+            # \z из регулярных выражений Django в re Python пишется как \Z.
+            document = yaml.safe_load(
+                SCHEMA_FILE.read_text(encoding='utf-8').replace('\\z', '\\Z')
+            )
+            schema = {'$ref': '#/components/schemas/RecipeList'}
+            resolver = RefResolver.from_schema(document)
+        reader = APIClient()
+        reader.force_authenticate(context['reader'])
+        for client, template in product(
+            (reader, APIClient()), CARD_CONTRACT_URLS,
+        ):
+            url = template.format(limit=LARGE_PAGE, **context)
+            response = client.get(url)
+            cards = response.data['results']
+            expected = self.serialize_recipes(
+                [card['id'] for card in cards], response.wsgi_request,
+            )
+            if ORJSONRenderer().render(cards) != expected:
+                raise CommandError(
+                    f'{url}: карточки рецептов расходятся с RecipeSerializer.'
+                )
+            if schema is None:
+                continue
+            for card in cards:
+                try:
+                    validate(card, schema, resolver=resolver)
+                except ValidationError as error:
+                    raise CommandError(
+                        f'{url}: рецепт {card["id"]} не по схеме: '
+                        f'{error.message}'
+                    )
+        if schema is None:
+            self.stdout.write(self.style.WARNING(
+                f'{SCHEMA_FILE} не найден, проверка по схеме пропущена.'
+            ))
+
+    def benchmark_recipe_cards(self, context):
+        """Сравнивает сериализацию страницы рецептов двумя путями."""
+        request = APIClient().get(
+            f'/api/recipes/?limit={LARGE_PAGE}'
+        ).wsgi_request
+        request.user = context['reader']
+        queryset = Recipe.objects.with_user_flags(request.user).order_by(
+            '-pub_date', '-id'
+        )
+        recipe_ids = list(
+            queryset.values_list('pk', flat=True)[:LARGE_PAGE]
+        )
+
+        def cards():
+            rows = list(queryset.values(
+                *CARD_FIELDS, 'favorited', 'in_shopping_cart',
+            )[:LARGE_PAGE])
+            return ORJSONRenderer().render(build_recipe_cards(rows, request))
+
+        timings = {}
+        for name, render in (
+            ('RecipeSerializer + JSONRenderer',
+             lambda: self.serialize_recipes(recipe_ids, request)),
+            ('values() + orjson', cards),
+        ):
+            started = time.perf_counter()
+            for _ in range(CARD_BENCH_ROUNDS):
+                render()
+            timings[name] = (
+                (time.perf_counter() - started) * 1000 / CARD_BENCH_ROUNDS
+            )
+            self.stdout.write(
+                f'{name}: {timings[name]:.1f} мс на {LARGE_PAGE} рецептов'
+            )
+        slow, fast = timings.values()
+        self.stdout.write(f'Ускорение сериализации: {slow / fast:.1f}x')
+
+    def get_forbidden_sql(self, name, statements):
+        """Запрещённые конструкции в запросах к таблице рецептов."""
+        if name not in FLAT_RECIPE_ENDPOINTS:
+            return []
+        return sorted({
+            keyword
+            for sql in statements if RECIPE_TABLE_SQL in sql
+            for keyword in FORBIDDEN_RECIPE_SQL if keyword in sql.upper()
+        })
+
+    def write_budget(self, budget_path, budget, results):
+        updated = {}
+        for name, metrics in results.items():
+            entry = {'queries': metrics['queries']}
+            if budget.get(name, {}).get('grows_with_page_size'):
+                entry['grows_with_page_size'] = True
+            updated[name] = entry
+        budget_path.write_text(
+            json.dumps(updated, indent=2, ensure_ascii=False) + '\n',
+            encoding='utf-8',
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Бюджет записан в {budget_path}.'
+        ))
+
+    def check_budget(self, budget, results):
+        self.stdout.write(
+            f'{"эндпоинт":<44} {"запросы":>8} {"бюджет":>7} '
+            f'{"SQL, мс":>9} {"всего, мс":>10}'
+        )
+        failures = []
+        for name, metrics in results.items():
+            entry = budget.get(name)
+            limit = entry['queries'] if entry else None
+            problems = []
+            if limit is None:
+                problems.append('нет бюджета')
+            elif metrics['queries'] > limit:
+                problems.append(f'превышен бюджет {limit}')
+            if metrics['grows'] and not (
+                entry and entry.get('grows_with_page_size')
+            ):
+                problems.append('растёт с размером страницы')
+            if metrics['forbidden_sql']:
+                problems.append(
+                    f'{", ".join(metrics["forbidden_sql"])} '
+                    f'в запросе к рецептам'
+                )
+            line = (
+                f'{name:<44} {metrics["queries"]:>8} '
+                f'{"-" if limit is None else limit:>7} '
+                f'{metrics["sql_ms"]:>9.1f} {metrics["wall_ms"]:>10.1f}'
+            )
+            if problems:
+                failures.append(f'{name}: {", ".join(problems)}')
+                line = self.style.ERROR(f'{line}  {"; ".join(problems)}')
+            self.stdout.write(line)
+        if failures:
+            raise CommandError(
+                'Бюджет запросов нарушен:\n' + '\n'.join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS('Бюджет запросов соблюдён.'))
@@ -0,0 +1,133 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingList
+from users.models import Follow, User
+
+LOADTEST_USERNAME = 'loadtest'
+# эндпоинт: (шаблон пути, модель связи, поле цели в связи)
+ENDPOINTS = {
+    'favorite': ('/api/recipes/{}/favorite/', FavoriteRecipe, 'recipe'),
+    'shopping_cart': (
+        '/api/recipes/{}/shopping_cart/', ShoppingList, 'recipe',
+    ),
+    'subscribe': ('/api/users/{}/subscribe/', Follow, 'author'),
+}
+
+
+class Command(BaseCommand):
+    """Нагрузочный тест эндпоинтов избранного, корзины и подписки."""
+
+    help = (
+        'Переключает избранное, корзину или подписку на запущенных '
+        'серверах и сравнивает запросы в секунду и задержку p99. '
+        'Серверы должны работать с той же БД, что и команда.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'servers', nargs='+',
+            help=(
+                'Адреса серверов, например sync=http://127.0.0.1:8000 '
+                'asgi=http://127.0.0.1:8001.'
+            ),
+        )
+        parser.add_argument(
+            '--endpoint', choices=ENDPOINTS, default='favorite',
+            help='Какой эндпоинт нагружать.',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=2000,
+            help='Сколько запросов отправить на каждый сервер.',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=32,
+            help='Сколько клиентов работает одновременно.',
+        )
+
+    def handle(self, *args, **options):
+        path, model, target_field = ENDPOINTS[options['endpoint']]
+        user = self.get_user()
+        targets = self.get_targets(user, target_field, options['concurrency'])
+        token, _ = Token.objects.get_or_create(user=user)
+        self.stdout.write(
+            f'{"сервер":<24} {"запросов/с":>10} {"p50, мс":>8} '
+            f'{"p99, мс":>8} {"ошибки":>7}'
+        )
+        for server in options['servers']:
+            name, _, url = server.rpartition('=')
+            model.objects.filter(user=user).delete()
+            latencies, errors, elapsed = self.run(
+                url.rstrip('/') + path, token.key, targets,
+                options['requests'],
+            )
+            model.objects.filter(user=user).delete()
+            percentiles = statistics.quantiles(latencies, n=100)
+            self.stdout.write(
+                f'{name or url:<24} {len(latencies) / elapsed:>10.0f} '
+                f'{percentiles[49] * 1000:>8.1f} '
+                f'{percentiles[98] * 1000:>8.1f} {errors:>7}'
+            )
+
+    def get_user(self):
+        user, created = User.objects.get_or_create(
+            username=LOADTEST_USERNAME,
+            defaults={
+                'email': f'{LOADTEST_USERNAME}@example.com',
+                'first_name': LOADTEST_USERNAME,
+                'last_name': LOADTEST_USERNAME,
+            },
+        )
+        if created:
+            user.set_unusable_password()
+            user.save(update_fields=['password'])
+        return user
+
+    def get_targets(self, user, target_field, count):
+        """У каждого клиента своя цель, чтобы переключения не пересекались."""
+        if target_field == 'author':
+            queryset = User.objects.exclude(pk=user.pk)
+        else:
+            queryset = Recipe.objects.all()
+        targets = list(
+            queryset.order_by('-pk').values_list('pk', flat=True)[:count]
+        )
+        if len(targets) < count:
+            raise CommandError(
+                f'Для {count} клиентов нужно не меньше {count} целей, '
+                f'в БД их {len(targets)}.'
+            )
+        return targets
+
+    def run(self, template, token, targets, total):
+        """Каждый клиент по очереди добавляет и удаляет свою цель."""
+        per_client = max(total // len(targets), 1)
+
+        def client(target):
+            url = template.format(target)
+            latencies = []
+            errors = 0
+            with requests.Session() as session:
+                session.headers['Authorization'] = f'Token {token}'
+                for number in range(per_client):
+                    method = session.delete if number % 2 else session.post
+                    started = time.perf_counter()
+                    response = method(url)
+                    latencies.append(time.perf_counter() - started)
+                    if response.status_code not in (201, 204):
+                        errors += 1
+                if per_client % 2:
+                    session.delete(url)
+            return latencies, errors
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+            results = list(executor.map(client, targets))
+        elapsed = time.perf_counter() - started
+        latencies = [value for result, _ in results for value in result]
+        return latencies, sum(errors for _, errors in results), elapsed
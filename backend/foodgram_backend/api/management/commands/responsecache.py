@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from utils.response_cache import response_cache
+
+
+class Command(BaseCommand):
+    """Для просмотра статистики и сброса кэша ответов API."""
+
+    help = 'Показывает попадания и промахи кэша ответов API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить счётчики.',
+        )
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Сбросить все закэшированные ответы.',
+        )
+
+    def handle(self, *args, **options):
+        stats = response_cache.stats()
+        total = sum(stats.values())
+        hits = stats['local_hits'] + stats['shared_hits']
+        for name, value in stats.items():
+            self.stdout.write(f'{name}: {value}')
+        if total:
+            self.stdout.write(f'hit_ratio: {hits / total:.1%}')
+        if options['reset']:
+            response_cache.reset_stats()
+        if options['clear']:
+            response_cache.clear()
+            self.stdout.write(self.style.SUCCESS('Кэш ответов сброшен.'))
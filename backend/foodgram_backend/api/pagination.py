@@ -1,7 +1,181 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+from functools import partial
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
+
+from utils.cache import get_versions
+from utils.constants import COUNT_CACHE_TIMEOUT
+from utils.db import estimate_count
+
+from .signals import VIEWER_COUNTS_VERSION
+
+COUNT_IGNORED_PARAMS = {
+    'page', 'limit', 'ordering', 'pagination', 'cursor', 'format',
+}
+COUNT_PER_USER_PARAMS = {'is_favorited', 'is_in_shopping_cart'}
+
+
+class CountCachingPaginator(Paginator):
+    """
+    Paginator, который берёт count из кэша; при промахе для больших
+    таблиц без фильтров count берётся из статистики планировщика
+    и кэшируется под тем же версионированным ключом.
+    """
+
+    def __init__(self, object_list, per_page, count_key=None,
+                 count_timeout=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+        self.count_timeout = count_timeout
+        self.count_is_exact = True
+
+    @cached_property
+    def count(self):
+        cached = cache.get(self.count_key)
+        if cached is None:
+            count = estimate_count(self.object_list)
+            exact = count is None
+            if exact:
+                count = self.object_list.count()
+            cached = count, exact
+            cache.set(self.count_key, cached, self.count_timeout)
+        count, self.count_is_exact = cached
+        return count
 
 
 class LimitPageNumberPaginator(PageNumberPagination):
     """Пагинация."""
 
     page_size_query_param = 'limit'
+    count_cache_timeout = None
+
+    def get_count_key(self, request, view):
+        """
+        Ключ кэша count: эндпоинт, нормализованный набор фильтров
+        и версии данных, от которых зависит выборка.
+        """
+        params = sorted(
+            (name, tuple(sorted(request.query_params.getlist(name))))
+            for name in request.query_params
+            if name not in COUNT_IGNORED_PARAMS
+        )
+        per_user = (
+            COUNT_PER_USER_PARAMS.intersection(request.query_params)
+            or getattr(view, 'action', None)
+            in getattr(view, 'per_user_count_actions', ())
+        )
+        user_id = request.user.pk if per_user else None
+        names = [view.count_version]
+        if user_id is not None:
+            names.append(VIEWER_COUNTS_VERSION.format(user_id))
+        versions = get_versions(*names)
+        digest = hashlib.md5(repr((
+            request.path, params, user_id,
+            [versions[name] for name in names],
+        )).encode()).hexdigest()
+        return f'counts:page:{digest}'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.count_cache_timeout is not None:
+            self.django_paginator_class = partial(
+                CountCachingPaginator,
+                count_key=self.get_count_key(request, view),
+                count_timeout=self.count_cache_timeout,
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        count_is_exact = getattr(self.page.paginator, 'count_is_exact', True)
+        response['X-Count-Exact'] = str(count_is_exact).lower()
+        return response
+
+
+class CachedCountPaginator(LimitPageNumberPaginator):
+    """Пагинация с кэшируемым или приблизительным count."""
+
+    count_cache_timeout = COUNT_CACHE_TIMEOUT
+
+
+class LimitCursorPaginator(CursorPagination):
+    """
+    Курсорная пагинация: страницы выбираются по ключу сортировки
+    без OFFSET и без подсчёта общего количества.
+    """
+
+    page_size_query_param = 'limit'
+    ordering = ('-pub_date', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        self.ordering = getattr(view, 'cursor_ordering', self.ordering)
+        return super().get_ordering(request, queryset, view)
+
+
+class CursorPaginationMixin:
+    """
+    Включает курсорную пагинацию по запросу клиента:
+    ?pagination=cursor для первой страницы или ?cursor=... для следующих.
+    """
+
+    cursor_pagination_class = LimitCursorPaginator
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if 'cursor' in params or params.get('pagination') == 'cursor':
+                self._paginator = self.cursor_pagination_class()
+        return super().paginator
+
+
+class FeedPaginator(CursorPagination):
+    """
+    Keyset-пагинация ленты: курсор хранит позицию (pub_date, id)
+    последнего показанного рецепта, без OFFSET и count.
+    """
+
+    page_size_query_param = 'limit'
+
+    def paginate_feed(self, request, get_feed):
+        """Возвращает id рецептов страницы ленты get_feed."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        feed = get_feed(
+            request.user, self.page_size + 1, self.get_position(request),
+        )
+        self.has_next = len(feed) > self.page_size
+        self.page = feed[:self.page_size]
+        return [recipe_id for _, recipe_id in self.page]
+
+    def get_position(self, request):
+        cursor = self.decode_cursor(request)
+        if cursor is None:
+            return None
+        try:
+            pub_date, recipe_id = cursor.position.rsplit(' ', 1)
+            position = parse_datetime(pub_date), int(recipe_id)
+        except (AttributeError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if position[0] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        pub_date, recipe_id = self.page[-1]
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=False,
+            position=f'{pub_date.isoformat()} {recipe_id}',
+        ))
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
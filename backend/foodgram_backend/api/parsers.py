@@ -0,0 +1,84 @@
+import orjson
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.utils.datastructures import MultiValueDict
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.parsers import BaseParser, DataAndFiles, MultiPartParser
+
+from utils.constants import IMAGE_UPLOAD_MAX_SIZE, UPLOAD_CHUNK_SIZE
+
+from .renderers import ORJSONRenderer
+
+FILE_TOO_LARGE: str = (
+    f'Размер файла не должен превышать {IMAGE_UPLOAD_MAX_SIZE // 2 ** 20} МБ.'
+)
+
+
+class ORJSONParser(BaseParser):
+    """JSON-тело запроса через orjson."""
+
+    media_type = 'application/json'
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as error:
+            raise ParseError(f'JSON parse error - {error}')
+
+
+class UploadedFiles(MultiValueDict):
+    """
+    Файлы запроса. Request.data склеивает данные и файлы через
+    dict.update, который у MultiValueDict без своего __iter__
+    берёт списки значений, а не сами файлы.
+    """
+
+    def __iter__(self):
+        return super().__iter__()
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Пишет загружаемые файлы во временный файл частями
+    и обрывает загрузку, как только превышен лимит размера.
+    """
+
+    chunk_size = UPLOAD_CHUNK_SIZE
+
+    def handle_raw_input(
+        self, input_data, META, content_length, boundary, encoding=None
+    ):
+        if content_length > (
+            IMAGE_UPLOAD_MAX_SIZE + settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        ):
+            raise ValidationError({'image': [FILE_TOO_LARGE]})
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > IMAGE_UPLOAD_MAX_SIZE:
+            self.upload_interrupted()
+            raise ValidationError({self.field_name: [FILE_TOO_LARGE]})
+        return super().receive_data_chunk(raw_data, start)
+
+
+class MultipartJsonParser(MultiPartParser):
+    """
+    multipart/form-data с файлами. Вложенные поля рецепта
+    передаются JSON-объектом в части data, файлы - отдельными частями.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = parser_context['request']
+        request.upload_handlers = [
+            LimitedTemporaryFileUploadHandler(request._request)
+        ]
+        parsed = super().parse(stream, media_type, parser_context)
+        if 'data' not in parsed.data:
+            return parsed
+        try:
+            data = orjson.loads(parsed.data['data'])
+        except ValueError as error:
+            raise ParseError(f'Некорректный JSON в части data: {error}')
+        if not isinstance(data, dict):
+            raise ParseError('Часть data должна быть JSON-объектом.')
+        return DataAndFiles(data, UploadedFiles(parsed.files))
@@ -12,11 +12,11 @@ class IsAdminOrReadOnly(permissions.BasePermission):
 class IsAuthorOrAdmin(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
-        if request.user.is_authenticated and (
-                request.user.is_superuser
-                or obj.author == request.user or request.method == 'POST'):
+        if request.method in permissions.SAFE_METHODS:
             return True
-        return request.method in permissions.SAFE_METHODS
+        return request.user.is_authenticated and (
+            request.user.is_superuser
+            or obj.author == request.user or request.method == 'POST')
 
 
 class IsAuthorOrReadOnly(permissions.BasePermission):
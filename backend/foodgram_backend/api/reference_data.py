@@ -0,0 +1,102 @@
+import gzip
+import hashlib
+import threading
+
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+from recipes.signals import REFERENCE_DATA_VERSION
+from utils.cache import get_version
+from utils.constants import REFERENCE_DATA_MAX_AGE
+
+from .renderers import ORJSONRenderer
+
+
+class ReferenceBody:
+    """Готовое тело ответа: JSON, его gzip-версия и ETag."""
+
+    def __init__(self, data):
+        self.content = ORJSONRenderer().render(data)
+        gzipped = gzip.compress(self.content)
+        self.gzipped = gzipped if len(gzipped) < len(self.content) else None
+        digest = hashlib.sha1(self.content).hexdigest()[:20]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+
+
+class ReferenceBodyCache:
+    """
+    Тела ответов справочников в памяти процесса.
+    Сбрасываются целиком при смене версии справочных данных.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.bodies = {}
+        self.lock = threading.Lock()
+
+    def get(self, key, build):
+        version = get_version(REFERENCE_DATA_VERSION)
+        with self.lock:
+            if version != self.version:
+                self.version = version
+                self.bodies = {}
+            body = self.bodies.get(key)
+        if body is None:
+            body = ReferenceBody(build())
+            with self.lock:
+                if version == self.version:
+                    self.bodies[key] = body
+        return body
+
+
+reference_bodies = ReferenceBodyCache()
+
+
+class ReferenceDataMixin:
+    """
+    Отдаёт список и объекты справочника из памяти процесса
+    с ETag, Cache-Control и ответом 304.
+    """
+
+    authentication_classes = []
+
+    def reference_response(self, request, key, build):
+        body = reference_bodies.get(f'{self.basename}:{key}', build)
+        gzipped = body.gzipped is not None and (
+            'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        etag = body.gzip_etag if gzipped else body.etag
+        etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if '*' in etags or etag in etags:
+            response = HttpResponse(status=304)
+        elif gzipped:
+            response = HttpResponse(
+                body.gzipped, content_type='application/json',
+            )
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(
+                body.content, content_type='application/json',
+            )
+        response['ETag'] = etag
+        response['Cache-Control'] = (
+            f'public, max-age={REFERENCE_DATA_MAX_AGE}'
+        )
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.reference_response(
+            request, 'list',
+            lambda: self.get_serializer(
+                self.filter_queryset(self.get_queryset()), many=True
+            ).data,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.reference_response(
+            request, kwargs[self.lookup_url_kwarg or self.lookup_field],
+            lambda: self.get_serializer(self.get_object()).data,
+        )
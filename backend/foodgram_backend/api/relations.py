@@ -0,0 +1,57 @@
+from django.db import transaction
+
+from recipes.counters import relations_changed
+from recipes.feed import follows_changed
+from recipes.models import ShoppingList
+from recipes.signals import SHOPPING_CART_VERSION
+from users.models import Follow
+from utils.cache import bump_version
+from utils.db import bulk_insert_ignore_conflicts, delete_returning
+from utils.response_cache import VIEWER_TAG, invalidate
+
+from .signals import VIEWER_COUNTS_VERSION
+
+
+def user_relations_changed(model, instances, delta):
+    """
+    То же, что сигналы делают для избранного, покупок и подписок,
+    но для строк, записанных в обход save() и delete().
+    """
+    instances = list(instances)
+    if not instances:
+        return
+    relations_changed(model, instances, delta)
+    user_ids = {instance.user_id for instance in instances}
+    versions = [VIEWER_COUNTS_VERSION.format(pk) for pk in user_ids]
+    if model is ShoppingList:
+        versions += [SHOPPING_CART_VERSION.format(pk) for pk in user_ids]
+    elif model is Follow:
+        follows_changed(instances, delta)
+    bump_version(*versions)
+    invalidate(*(VIEWER_TAG.format(pk) for pk in user_ids))
+
+
+def add_relations(model, rows):
+    """
+    Создаёт связи одним INSERT ... ON CONFLICT DO NOTHING и возвращает
+    только новые: уже существующие, в том числе при гонке двух
+    одинаковых запросов, пропускаются.
+    """
+    with transaction.atomic():
+        created = bulk_insert_ignore_conflicts(model, rows)
+        user_relations_changed(model, created, 1)
+    return created
+
+
+def add_relation(model, **values):
+    """Созданная связь или None, если она уже была."""
+    created = add_relations(model, [values])
+    return created[0] if created else None
+
+
+def remove_relation(model, **lookups):
+    """Удаляет связи одним DELETE ... RETURNING, возвращает удалённые."""
+    with transaction.atomic():
+        deleted = delete_returning(model.objects.filter(**lookups))
+        user_relations_changed(model, deleted, -1)
+    return deleted
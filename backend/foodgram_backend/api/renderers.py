@@ -0,0 +1,74 @@
+import json
+from decimal import Decimal
+
+import orjson
+from django.db.models.query import QuerySet
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+
+def encode_default(value):
+    """Типы, которые orjson не сериализует сам."""
+    if isinstance(value, Promise):
+        return force_str(value)
+    if isinstance(value, Decimal):
+        return (
+            str(value) if api_settings.COERCE_DECIMAL_TO_STRING
+            else float(value)
+        )
+    if isinstance(value, bytes):
+        return value.decode()
+    if isinstance(value, (QuerySet, set, frozenset)):
+        return list(value)
+    raise TypeError(f'{type(value).__name__} не сериализуется в JSON.')
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    JSON через orjson. Вывод, как у JSONRenderer с настройками
+    по умолчанию: компактный, в UTF-8 без экранирования.
+    """
+
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        option = orjson.OPT_NON_STR_KEYS
+        if accepted_media_type and 'indent=' in accepted_media_type:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=encode_default, option=option)
+
+
+class ExportRenderer(BaseRenderer):
+    """
+    Рендерер для выгрузки файлов: готовое содержимое отдаётся как есть,
+    а ответы с ошибками сериализуются в JSON.
+    """
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+class PDFRenderer(ExportRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+
+class PlainTextRenderer(ExportRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
@@ -0,0 +1,123 @@
+import hashlib
+import json
+
+from django.conf import settings
+from rest_framework.filters import OrderingFilter
+from rest_framework.response import Response
+
+from recipes.signals import REFERENCE_DATA_VERSION
+from utils.cache import get_versions
+from utils.constants import RESPONSE_CACHE_TIMEOUT
+from utils.response_cache import (RECIPE_COUNTERS_TAG, RECIPE_TAG, RECIPES_TAG,
+                                  RESPONSE_CACHE_VERSION, USER_TAG, VIEWER_TAG,
+                                  response_cache)
+
+
+class ResponseCacheMixin:
+    """
+    Кэширует успешные ответы list и retrieve в двухуровневом кэше.
+    Ключ зависит от нормализованных параметров запроса и пользователя,
+    запись сбрасывается по тегам данных, от которых она зависит.
+    """
+
+    response_cache_actions = ('list', 'retrieve')
+
+    def get_response_cache_key(self, request):
+        params = sorted(
+            (name, value)
+            for name in request.query_params
+            for value in set(request.query_params.getlist(name))
+            if value != ''
+        )
+        user = request.user
+        digest = hashlib.md5(json.dumps([
+            self.basename, self.action, sorted(self.kwargs.items()),
+            params, user.pk if user.is_authenticated else None,
+        ], ensure_ascii=False).encode()).hexdigest()
+        return f'response:{digest}'
+
+    def get_base_cache_tags(self, request):
+        """Теги, известные до построения ответа."""
+        tags = [RESPONSE_CACHE_VERSION]
+        if request.user.is_authenticated:
+            tags.append(VIEWER_TAG.format(request.user.pk))
+        return tags
+
+    def get_data_cache_tags(self, data):
+        """Теги объектов, попавших в ответ."""
+        return []
+
+    def cached_response(self, request, build):
+        if (
+            not settings.RESPONSE_CACHE_ENABLED
+            or self.action not in self.response_cache_actions
+        ):
+            return build()
+        key = self.get_response_cache_key(request)
+        entry, source = response_cache.get(key)
+        if entry is not None:
+            response = Response(entry['data'], headers=entry['headers'])
+        else:
+            # Версии снимаются до построения ответа, чтобы запись,
+            # изменённая во время построения, сразу оказалась устаревшей.
+            versions = get_versions(*self.get_base_cache_tags(request))
+            response = build()
+            if response.status_code == 200:
+                versions.update(get_versions(*(
+                    set(self.get_data_cache_tags(response.data))
+                    - versions.keys()
+                )))
+                response_cache.set(key, {
+                    'data': response.data,
+                    'headers': {
+                        name: value for name, value in response.items()
+                        if name != 'Content-Type'
+                    },
+                    'tags': versions,
+                }, RESPONSE_CACHE_TIMEOUT)
+        response['X-Cache'] = source
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, lambda: super(ResponseCacheMixin, self).list(
+                request, *args, **kwargs
+            ),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, lambda: super(ResponseCacheMixin, self).retrieve(
+                request, *args, **kwargs
+            ),
+        )
+
+
+class RecipeResponseCacheMixin(ResponseCacheMixin):
+    """
+    Рецепт зависит от себя, автора и справочников, страница списка -
+    от всех рецептов, а при сортировке по избранному и от счётчиков.
+    """
+
+    def get_base_cache_tags(self, request):
+        tags = super().get_base_cache_tags(request) + [REFERENCE_DATA_VERSION]
+        if self.action != 'list':
+            return tags + [RECIPE_TAG.format(self.kwargs['pk'])]
+        tags.append(RECIPES_TAG)
+        if 'favorites_count' in request.query_params.get(
+            OrderingFilter.ordering_param, '',
+        ):
+            tags.append(RECIPE_COUNTERS_TAG)
+        return tags
+
+    def get_data_cache_tags(self, data):
+        if self.action != 'list':
+            yield USER_TAG.format(data['author']['id'])
+
+
+class UserResponseCacheMixin(ResponseCacheMixin):
+
+    response_cache_actions = ('retrieve',)
+
+    def get_data_cache_tags(self, data):
+        return [USER_TAG.format(data['id'])]
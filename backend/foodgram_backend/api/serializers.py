@@ -1,11 +1,143 @@
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import (CurrentPasswordSerializer, PasswordSerializer,
                                 UserCreateSerializer)
 from djoser.serializers import UserSerializer as BaseUserSerializer
 from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
 from rest_framework import serializers
 
 from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.signals import invalidate_shopping_carts
 from users.models import User
+from utils.constants import (BULK_RECIPES_MAX, IMAGE_MAX_SIDE,
+                             IMAGE_UPLOAD_MAX_SIZE)
+
+from .parsers import FILE_TOO_LARGE
+
+# Поля строки values(), из которой строится карточка рецепта.
+# pub_date нужна курсорной пагинации.
+CARD_FIELDS = (
+    'id', 'name', 'image', 'image_variants', 'text', 'cooking_time',
+    'author_id', 'pub_date',
+)
+AUTHOR_FIELDS = ('email', 'id', 'username', 'first_name', 'last_name')
+TAG_FIELDS = ('id', 'name', 'color', 'slug')
+
+
+def get_image_variant_urls(value, request=None):
+    """{вариант: {формат: имя файла}} -> {вариант: {формат: url}}."""
+    representation = {}
+    for variant, formats in value.items():
+        if not isinstance(formats, dict):
+            continue
+        representation[variant] = {}
+        for image_format, name in formats.items():
+            url = default_storage.url(name)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            representation[variant][image_format] = url
+    return representation
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    URL уменьшенных копий изображения: {вариант: {формат: url}}.
+    Пока копии не готовы, возвращает пустой объект.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return get_image_variant_urls(value, self.context.get('request'))
+
+
+class LimitedImageField(serializers.ImageField):
+    """
+    Проверяет размер файла и стороны изображения по заголовку,
+    до того как изображение будет проверено целиком.
+    """
+
+    default_error_messages = {
+        'too_large': FILE_TOO_LARGE,
+        'too_wide': (
+            f'Стороны изображения не должны превышать {IMAGE_MAX_SIDE} px.'
+        ),
+    }
+
+    def to_internal_value(self, data):
+        if data.size > IMAGE_UPLOAD_MAX_SIZE:
+            self.fail('too_large')
+        try:
+            with Image.open(data) as image:
+                width, height = image.size
+        except (OSError, Image.DecompressionBombError):
+            self.fail('invalid_image')
+        finally:
+            data.seek(0)
+        if max(width, height) > IMAGE_MAX_SIDE:
+            self.fail('too_wide')
+        return super().to_internal_value(data)
+
+
+class BulkPrimaryKeyRelatedField(serializers.ManyRelatedField):
+    """
+    PrimaryKeyRelatedField(many=True), который достаёт все объекты
+    одним запросом in_bulk, а не запросом на каждый id.
+    """
+
+    def __init__(self, queryset, **kwargs):
+        super().__init__(
+            child_relation=serializers.PrimaryKeyRelatedField(
+                queryset=queryset,
+            ),
+            **kwargs,
+        )
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        child = self.child_relation
+        queryset = child.get_queryset()
+        pks = []
+        for value in data:
+            try:
+                if isinstance(value, bool):
+                    raise TypeError
+                pks.append(queryset.model._meta.pk.to_python(value))
+            except (DjangoValidationError, TypeError):
+                child.fail('incorrect_type', data_type=type(value).__name__)
+        objects = queryset.in_bulk(pks)
+        for pk, value in zip(pks, data):
+            if pk not in objects:
+                child.fail('does_not_exist', pk_value=value)
+        return [objects[pk] for pk in pks]
+
+
+class RecipeImageField(Base64ImageField, LimitedImageField):
+    """
+    Изображение строкой base64 в JSON или файлом из multipart/form-data.
+    Строка base64 не декодируется, если файл заведомо больше лимита.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            return LimitedImageField.to_internal_value(self, data)
+        if isinstance(data, str) and (
+            len(data.partition(';base64,')[2] or data) * 3 // 4
+            > IMAGE_UPLOAD_MAX_SIZE
+        ):
+            self.fail('too_large')
+        return super().to_internal_value(data)
 
 
 class UserSerializer(BaseUserSerializer):
@@ -25,6 +157,8 @@ class UserSerializer(BaseUserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.following.filter(user=request.user).exists()
@@ -78,16 +212,42 @@ class SubscriptionSerializer(UserSerializer):
         )
 
     def get_recipes(self, obj):
-        recipes_limit = self.context['request'].GET.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if recipes_limit:
-            recipes = recipes[:int(recipes_limit)]
+        if hasattr(obj, 'limited_recipes'):
+            recipes = obj.limited_recipes
+        else:
+            params = SubscriptionParamsSerializer(
+                data=self.context['request'].GET
+            )
+            params.is_valid(raise_exception=True)
+            recipes_limit = params.validated_data.get('recipes_limit')
+            recipes = obj.recipes.all()
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
         return RecipeLightSerializer(
             recipes, many=True, read_only=True
         ).data
 
     def get_recipes_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
+
+
+class SubscriptionParamsSerializer(serializers.Serializer):
+    """Параметры списка подписок."""
+
+    recipes_limit = serializers.IntegerField(required=False, min_value=0)
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список рецептов для массового добавления в корзину или избранное."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_RECIPES_MAX,
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -106,14 +266,24 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class IngredientSearchSerializer(serializers.Serializer):
+    """Параметры поиска ингредиентов."""
+
+    name = serializers.CharField(required=False, allow_blank=True)
+    limit = serializers.IntegerField(required=False, min_value=1)
+
+
 class RecipeLightSerializer(serializers.ModelSerializer):
     """Сериализатор для отображения рецептов на странице подписок."""
 
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
         fields = (
             'id', 'name',
-            'image', 'cooking_time',
+            'image', 'image_variants',
+            'cooking_time',
             'pub_date',
         )
 
@@ -155,15 +325,20 @@ class RecipeSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
-    image = Base64ImageField()
+    image = RecipeImageField()
+    image_variants = ImageVariantsField()
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'favorited'):
+            return obj.favorited
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.is_favorited(request.user)
         return False
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'in_shopping_cart'):
+            return obj.in_shopping_cart
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.is_in_shopping_cart(request.user)
@@ -177,6 +352,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_favorited',
             'is_in_shopping_cart',
             'name', 'image',
+            'image_variants',
             'text', 'cooking_time',
         )
 
@@ -184,8 +360,7 @@ class RecipeSerializer(serializers.ModelSerializer):
 class RecipeCreateIngredientsSerializer(serializers.ModelSerializer):
     """Создание рецепта."""
 
-    id = serializers.PrimaryKeyRelatedField(
-        source='ingredient', queryset=Ingredient.objects.all())
+    id = serializers.IntegerField(source='ingredient.id')
     name = serializers.ReadOnlyField(source='ingredient.name')
     measurement_unit = serializers.ReadOnlyField(
         source='ingredient.measurement_unit'
@@ -208,47 +383,208 @@ class RecipeCreateIngredientsSerializer(serializers.ModelSerializer):
 class RecipeWriteSerializer(RecipeSerializer):
     """Сериализатор для создания и обновления рецептов."""
 
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True, queryset=Tag.objects.all(),
-    )
+    tags = BulkPrimaryKeyRelatedField(queryset=Tag.objects.all())
     ingredients = RecipeCreateIngredientsSerializer(
         many=True, source='recipeingredients'
     )
 
-    def create_or_update_recipe_ingredients(self, recipe, ingredients):
-        recipe_ingredients = []
-        for ingredient_data in ingredients:
-            if isinstance(ingredient_data['ingredient'], Ingredient):
-                ingredient = ingredient_data['ingredient']
-                ingredient_id = ingredient.id
-            else:
-                ingredient_id = ingredient_data['ingredient'].get('id')
-
-            if ingredient_id:
-                ingredient = Ingredient.objects.get(id=ingredient_id)
-                recipe_ingredients.append(
-                    RecipeIngredient(
-                        recipe=recipe, ingredient=ingredient,
-                        amount=ingredient_data['amount']
-                    )
-                )
-
-        if recipe_ingredients:
-            RecipeIngredient.objects.bulk_create(recipe_ingredients)
+    def validate_ingredients(self, value):
+        """Все ингредиенты рецепта достаются одним запросом."""
+        ids = [item['ingredient']['id'] for item in value]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError(
+                'Ингредиенты рецепта не должны повторяться.'
+            )
+        ingredients = Ingredient.objects.in_bulk(ids)
+        missing = [pk for pk in ids if pk not in ingredients]
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиентов с id {missing} не существует.'
+            )
+        return [
+            {'ingredient': ingredients[item['ingredient']['id']],
+             'amount': item['amount']}
+            for item in value
+        ]
+
+    def to_representation(self, instance):
+        """
+        DRF сбрасывает prefetch после update(), поэтому теги
+        и ингредиенты с названиями перечитываются одним запросом каждые.
+        """
+        prefetch_related_objects(
+            [instance], 'tags',
+            Prefetch(
+                'recipeingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient'),
+            ),
+        )
+        return super().to_representation(instance)
 
+    @staticmethod
+    def set_tags(recipe, tags, current=()):
+        """Добавляет и удаляет только изменившиеся теги."""
+        tag_ids = {tag.pk for tag in tags}
+        current_ids = {tag.pk for tag in current}
+        if current_ids - tag_ids:
+            recipe.tags.remove(*(current_ids - tag_ids))
+        if tag_ids - current_ids:
+            recipe.tags.add(*(tag_ids - current_ids))
+
+    @staticmethod
+    def set_ingredients(recipe, ingredients, current=()):
+        """
+        Сравнивает ингредиенты рецепта с новыми и пачками
+        добавляет, обновляет и удаляет только отличающиеся строки.
+        """
+        amounts = {
+            item['ingredient'].pk: item['amount'] for item in ingredients
+        }
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in current
+        }
+        deleted = [
+            recipe_ingredient.pk
+            for ingredient_id, recipe_ingredient in current.items()
+            if ingredient_id not in amounts
+        ]
+        updated = []
+        for ingredient_id, recipe_ingredient in current.items():
+            amount = amounts.get(ingredient_id, recipe_ingredient.amount)
+            if recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                updated.append(recipe_ingredient)
+        created = [
+            RecipeIngredient(
+                recipe=recipe, ingredient=item['ingredient'],
+                amount=item['amount'],
+            )
+            for item in ingredients
+            if item['ingredient'].pk not in current
+        ]
+        if deleted:
+            RecipeIngredient.objects.filter(pk__in=deleted).delete()
+        if updated:
+            RecipeIngredient.objects.bulk_update(updated, ['amount'])
+        if created:
+            RecipeIngredient.objects.bulk_create(created)
+        if updated or created:
+            invalidate_shopping_carts([recipe.pk])
+
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('recipeingredients')
         recipe = super().create(validated_data)
-        recipe.tags.set(tags)
-        self.create_or_update_recipe_ingredients(recipe, ingredients)
+        self.set_tags(recipe, tags)
+        self.set_ingredients(recipe, ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('recipeingredients')
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('recipeingredients', None)
         recipe = super().update(instance, validated_data)
-        recipe.tags.set(tags)
-        RecipeIngredient.objects.filter(recipe=recipe).delete()
-        self.create_or_update_recipe_ingredients(recipe, ingredients)
+        if tags is not None:
+            self.set_tags(recipe, tags, recipe.tags.all())
+        if ingredients is not None:
+            self.set_ingredients(
+                recipe, ingredients, recipe.recipeingredients.all()
+            )
         return recipe
+
+
+def build_recipe_cards(rows, request=None):
+    """
+    Карточки рецептов в формате RecipeSerializer из строк values().
+    Авторы, теги и ингредиенты всех строк достаются тремя запросами.
+    """
+    if not rows:
+        return []
+    user = getattr(request, 'user', None)
+    recipe_ids = [row['id'] for row in rows]
+    authors = {}
+    author_fields = AUTHOR_FIELDS
+    queryset = User.objects.filter(pk__in={row['author_id'] for row in rows})
+    if user is not None and user.is_authenticated:
+        queryset = queryset.with_is_subscribed(user)
+        author_fields += ('is_subscribed',)
+    for author in queryset.values(*author_fields):
+        author.setdefault('is_subscribed', False)
+        authors[author['id']] = author
+
+    tags = defaultdict(list)
+    for recipe_id, *values in (
+        Recipe.tags.through.objects
+        .filter(recipe_id__in=recipe_ids)
+        .order_by('tag__name')
+        .values_list(
+            'recipe_id', *(f'tag__{field}' for field in TAG_FIELDS)
+        )
+    ):
+        tags[recipe_id].append(dict(zip(TAG_FIELDS, values)))
+
+    ingredients = defaultdict(list)
+    for recipe_id, pk, name, measurement_unit, amount in (
+        RecipeIngredient.objects
+        .filter(recipe_id__in=recipe_ids)
+        .order_by('pk')
+        .values_list(
+            'recipe_id', 'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount',
+        )
+    ):
+        ingredients[recipe_id].append({
+            'id': pk,
+            'name': name,
+            'measurement_unit': measurement_unit,
+            'amount': amount,
+        })
+
+    storage = Recipe._meta.get_field('image').storage
+    cards = []
+    for row in rows:
+        image = row['image']
+        if image:
+            image = storage.url(image)
+            if request is not None:
+                image = request.build_absolute_uri(image)
+        cards.append({
+            'id': row['id'],
+            'tags': tags[row['id']],
+            'author': authors.get(row['author_id']),
+            'ingredients': ingredients[row['id']],
+            'is_favorited': row.get('favorited', False),
+            'is_in_shopping_cart': row.get('in_shopping_cart', False),
+            'name': row['name'],
+            'image': image or None,
+            'image_variants': get_image_variant_urls(
+                row['image_variants'], request
+            ),
+            'text': row['text'],
+            'cooking_time': row['cooking_time'],
+        })
+    return cards
+
+
+class RecipeCardListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        return build_recipe_cards(list(data), self.context.get('request'))
+
+
+class RecipeCardSerializer(serializers.BaseSerializer):
+    """
+    Только для чтения: карточки рецептов из строк values()
+    без полей и вложенных сериализаторов DRF.
+    Формат ответа совпадает с RecipeSerializer.
+    """
+
+    class Meta:
+        list_serializer_class = RecipeCardListSerializer
+
+    def to_representation(self, instance):
+        return build_recipe_cards(
+            [instance], self.context.get('request')
+        )[0]
@@ -0,0 +1,128 @@
+import csv
+import io
+import json
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Paragraph, SimpleDocTemplate
+
+from recipes.models import RecipeIngredient
+from utils.constants import (BODY_FONT_SIZE, BULLET_INDENT, EXPORT_CHUNK_SIZE,
+                             HEADER_FONT_SIZE, LEFT_INDENT,
+                             SHOPPING_CART_CACHE_TIMEOUT)
+
+FONT_NAME = 'Xolonium-Regular'
+FONT_PATH = settings.BASE_DIR / 'Xolonium-Regular.ttf'
+PDF_CACHE_KEY = 'shopping_cart:pdf:{}:{}'
+HEADER_TEXT = 'Ваш список покупок:'
+CSV_HEADER = ('name', 'measurement_unit', 'amount')
+
+
+def get_shopping_list(user):
+    """
+    Ингредиенты из списка покупок пользователя,
+    суммированные по названию и единице измерения.
+    """
+    return (
+        RecipeIngredient.objects
+        .filter(recipe__shopping_list__user=user)
+        .values('ingredient__name', 'ingredient__measurement_unit')
+        .annotate(total=Sum('amount'))
+        .order_by('ingredient__name', 'ingredient__measurement_unit')
+    )
+
+
+def iter_rows(shopping_list):
+    """Построчно читает список покупок через серверный курсор."""
+    for item in shopping_list.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield (
+            item['ingredient__name'],
+            item['ingredient__measurement_unit'],
+            item['total'],
+        )
+
+
+def iter_txt(shopping_list):
+    yield f'{HEADER_TEXT}\n'
+    for name, unit, total in iter_rows(shopping_list):
+        yield f'• {name} - {total} {unit}\n'
+
+
+class Echo:
+    """Псевдобуфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(shopping_list):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for row in iter_rows(shopping_list):
+        yield writer.writerow(row)
+
+
+def iter_json(shopping_list):
+    separator = '['
+    for row in iter_rows(shopping_list):
+        yield separator + json.dumps(
+            dict(zip(CSV_HEADER, row)), ensure_ascii=False
+        )
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+
+EXPORTERS = {
+    'txt': (iter_txt, 'text/plain; charset=utf-8'),
+    'csv': (iter_csv, 'text/csv; charset=utf-8'),
+    'json': (iter_json, 'application/json'),
+}
+
+
+@lru_cache(maxsize=None)
+def get_pdf_styles():
+    """Регистрирует шрифт и собирает стили один раз на процесс."""
+    pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+    styles = getSampleStyleSheet()
+    header_style = styles['Heading1']
+    header_style.fontName = FONT_NAME
+    header_style.fontSize = HEADER_FONT_SIZE
+    body_style = styles['BodyText']
+    body_style.fontName = FONT_NAME
+    body_style.fontSize = BODY_FONT_SIZE
+    bullet_style = ParagraphStyle(
+        'Bullet', parent=body_style,
+        leftIndent=LEFT_INDENT,
+        bulletIndent=BULLET_INDENT,
+        fontSize=BODY_FONT_SIZE,
+        fontName=FONT_NAME,
+    )
+    return header_style, bullet_style
+
+
+def render_pdf(shopping_list):
+    """Формирует PDF со списком покупок."""
+    header_style, bullet_style = get_pdf_styles()
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    story = [Paragraph(HEADER_TEXT, header_style)]
+    for name, unit, total in iter_rows(shopping_list):
+        story.append(Paragraph(f"• {name} - {total} {unit}", bullet_style))
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def get_shopping_list_pdf(user, version):
+    """PDF списка покупок из кэша для данной версии корзины."""
+    key = PDF_CACHE_KEY.format(user.pk, version)
+    pdf = cache.get(key)
+    if pdf is None:
+        pdf = render_pdf(get_shopping_list(user))
+        cache.set(key, pdf, SHOPPING_CART_CACHE_TIMEOUT)
+    return pdf
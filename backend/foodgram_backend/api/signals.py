@@ -0,0 +1,95 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import (FavoriteRecipe, Recipe, RecipeIngredient,
+                            ShoppingList)
+from users.models import Follow, User
+from utils.cache import bump_version
+from utils.response_cache import (RECIPE_TAG, RECIPES_TAG, USER_TAG,
+                                  VIEWER_TAG, invalidate)
+
+# Версии кэша count: списки рецептов, пользователей и выборки,
+# зависящие от избранного, покупок и подписок одного пользователя.
+RECIPE_COUNTS_VERSION = 'counts:recipes:version'
+USER_COUNTS_VERSION = 'counts:users:version'
+VIEWER_COUNTS_VERSION = 'counts:viewer:{}:version'
+# Колонки рецепта, от которых зависят фильтры и поиск списка.
+RECIPE_COUNT_FIELDS = {'author', 'name', 'text'}
+# Колонки пользователя, которые видны в ответах API.
+USER_RESPONSE_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_count_saved(sender, instance, created, update_fields, **kwargs):
+    """Обычное сохранение без смены автора, названия и описания не в счёт."""
+    if created or RECIPE_COUNT_FIELDS.intersection(
+        instance.get_changed_fields(update_fields)
+    ):
+        bump_version(RECIPE_COUNTS_VERSION)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_count_changed(sender, **kwargs):
+    bump_version(RECIPE_COUNTS_VERSION)
+
+
+@receiver(post_save, sender=User)
+def user_count_saved(sender, instance, created, **kwargs):
+    """Список пользователей не фильтруется, важны только новые строки."""
+    if created:
+        bump_version(USER_COUNTS_VERSION)
+
+
+@receiver(post_delete, sender=User)
+def user_count_deleted(sender, instance, **kwargs):
+    bump_version(USER_COUNTS_VERSION)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    invalidate(RECIPES_TAG, RECIPE_TAG.format(instance.pk))
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    invalidate(RECIPES_TAG, RECIPE_TAG.format(instance.recipe_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if not action.startswith('post_'):
+        return
+    recipe_ids = (pk_set or ()) if reverse else [instance.pk]
+    invalidate(
+        RECIPES_TAG, *(RECIPE_TAG.format(pk) for pk in recipe_ids)
+    )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    """Вход и смена пароля не сбрасывают кэш ответов."""
+    if created or (
+        update_fields is not None
+        and not USER_RESPONSE_FIELDS.intersection(update_fields)
+    ):
+        return
+    tags = [USER_TAG.format(instance.pk)]
+    if instance.recipes_count:
+        tags.append(RECIPES_TAG)
+    invalidate(*tags)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    invalidate(RECIPES_TAG, USER_TAG.format(instance.pk))
+
+
+@receiver((post_save, post_delete), sender=FavoriteRecipe)
+@receiver((post_save, post_delete), sender=ShoppingList)
+@receiver((post_save, post_delete), sender=Follow)
+def viewer_relation_changed(sender, instance, **kwargs):
+    """Избранное, покупки и подписки видны только их владельцу."""
+    bump_version(VIEWER_COUNTS_VERSION.format(instance.user_id))
+    invalidate(VIEWER_TAG.format(instance.user_id))
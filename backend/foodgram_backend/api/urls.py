@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
+from . import async_views
 from .views import (ChangePasswordView, IngredientViewSet, RecipeViewSet,
                     SelfUserView, TagViewSet, UserViewSet)
 
@@ -35,3 +37,21 @@ urlpatterns = [
         name='token'
     )
 ]
+
+if settings.ASYNC_TOGGLE_VIEWS:
+    # Экспериментально, по умолчанию выключено: запись идёт через
+    # sync_to_async, и под нагрузкой эти view медленнее синхронных.
+    urlpatterns = [
+        path(
+            'recipes/<int:pk>/favorite/', async_views.favorite,
+            name='recipes-favorite'
+        ),
+        path(
+            'recipes/<int:pk>/shopping_cart/', async_views.shopping_cart,
+            name='recipes-shopping-cart'
+        ),
+        path(
+            'users/<int:pk>/subscribe/', async_views.subscribe,
+            name='users-subscribe'
+        ),
+    ] + urlpatterns
@@ -1,33 +1,48 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
 from django_filters import rest_framework as rf_filters
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.platypus import Paragraph, SimpleDocTemplate
 from rest_framework import filters, permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import GenericAPIView
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 
+from recipes.feed import get_feed
 from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
                             RecipeIngredient, ShoppingList, Tag)
+from recipes.signals import SHOPPING_CART_VERSION
 from users.models import Follow, User
-from utils.constants import (BODY_FONT_SIZE, BULLET_INDENT, HEADER_FONT_SIZE,
-                             LEFT_INDENT)
+from utils.cache import get_version
 
-from .filters import IngredientFilter, RecipeFilter
+from .filters import RecipeFilter, RecipeSearchFilter
+from .ingredient_index import ingredient_index
+from .pagination import (CachedCountPaginator, CursorPaginationMixin,
+                         FeedPaginator)
+from .parsers import MultipartJsonParser, ORJSONParser
 from .permissions import IsAuthorOrAdmin, IsAuthorOrReadOnly
-from .serializers import (ChangePasswordSerializer, IngredientSerializer,
+from .reference_data import ReferenceDataMixin
+from .relations import add_relation, add_relations, remove_relation
+from .renderers import (CSVRenderer, ORJSONRenderer, PDFRenderer,
+                        PlainTextRenderer)
+from .response_cache import RecipeResponseCacheMixin, UserResponseCacheMixin
+from .serializers import (CARD_FIELDS, ChangePasswordSerializer,
+                          IngredientSearchSerializer, IngredientSerializer,
+                          RecipeCardSerializer, RecipeIdsSerializer,
                           RecipeLightSerializer, RecipeSerializer,
                           RecipeWriteSerializer, RegistrationSerializer,
-                          SubscriptionSerializer, TagSerializer,
-                          UserSerializer)
+                          SubscriptionParamsSerializer, SubscriptionSerializer,
+                          TagSerializer, UserSerializer)
+from .shopping_list import EXPORTERS, get_shopping_list, get_shopping_list_pdf
+from .signals import RECIPE_COUNTS_VERSION, USER_COUNTS_VERSION
 
+EXPORT_RENDERERS = (PDFRenderer, PlainTextRenderer, CSVRenderer)
 
-class UserViewSet(viewsets.ModelViewSet):
+
+class UserViewSet(
+    UserResponseCacheMixin, CursorPaginationMixin, viewsets.ModelViewSet
+):
     """ViewSet для класса User."""
 
     queryset = User.objects.all()
@@ -35,6 +50,13 @@ class UserViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
     filter_backends = [filters.SearchFilter]
     http_method_names = ['get', 'post', 'patch', 'delete']
+    pagination_class = CachedCountPaginator
+    cursor_ordering = ('-id',)
+    count_version = USER_COUNTS_VERSION
+    per_user_count_actions = ('subscriptions',)
+
+    def get_queryset(self):
+        return User.objects.with_is_subscribed(self.request.user)
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -53,7 +75,28 @@ class UserViewSet(viewsets.ModelViewSet):
         permission_classes=[permissions.IsAuthenticated]
     )
     def subscriptions(self, request):
-        queryset = User.objects.filter(following__user=request.user)
+        params = SubscriptionParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        queryset = (
+            User.objects
+            .filter(following__user=request.user)
+            .with_is_subscribed(request.user)
+            .order_by(*User._meta.ordering)
+            .prefetch_related(Prefetch(
+                'recipes',
+                queryset=(
+                    Recipe.objects
+                    .top_per_author(
+                        params.validated_data.get('recipes_limit')
+                    )
+                    .only(
+                        'id', 'name', 'image', 'image_variants',
+                        'cooking_time', 'pub_date', 'author_id',
+                    )
+                ),
+                to_attr='limited_recipes',
+            ))
+        )
         page = self.paginate_queryset(queryset)
         serializer = SubscriptionSerializer(
             page,
@@ -69,44 +112,40 @@ class UserViewSet(viewsets.ModelViewSet):
     )
     def subscribe(self, request, pk):
         """Подписка на автора."""
-        followed = get_object_or_404(User, id=pk)
         follower = request.user
-        following = (
-            Follow.objects.filter(
-                user=follower,
-                author=followed,
-            ).exists()
-        )
         if request.method == 'DELETE':
-            if not following:
+            if not remove_relation(Follow, user=follower, author_id=pk):
+                if not User.objects.filter(id=pk).exists():
+                    raise Http404
                 content = {'errors': 'У вас не такой подписки'}
                 return Response(
                     content,
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            Follow.objects.filter(user=follower, author=followed).delete()
             return Response(
                 status=status.HTTP_204_NO_CONTENT,
             )
-        if request.method == 'POST':
-            if following:
-                content = {'errors': 'Вы уже подписаны на данного автора'}
-                return Response(
-                    content,
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            elif followed == follower:
-                content = {'errors': 'Нельзя подписаться самого себя'}
-                return Response(
-                    content,
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            Follow.objects.create(user=follower, author=followed)
-            serializer = SubscriptionSerializer(
-                followed,
-                context=self.get_serializer_context()
+        followed = get_object_or_404(User, id=pk)
+        if followed == follower:
+            content = {'errors': 'Нельзя подписаться самого себя'}
+            return Response(
+                content,
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        if add_relation(
+            Follow, user_id=follower.pk, author_id=followed.pk,
+        ) is None:
+            content = {'errors': 'Вы уже подписаны на данного автора'}
+            return Response(
+                content,
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        followed.is_subscribed = True
+        serializer = SubscriptionSerializer(
+            followed,
+            context=self.get_serializer_context()
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
 class SelfUserView(GenericAPIView):
@@ -136,12 +175,12 @@ class ChangePasswordView(GenericAPIView):
         )
         if serializer.is_valid():
             request.user.set_password(serializer.data['new_password'])
-            request.user.save()
+            request.user.save(update_fields=['password'])
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ReferenceDataMixin, viewsets.ReadOnlyModelViewSet):
     """Для отображения тега."""
 
     queryset = Tag.objects.all()
@@ -150,22 +189,35 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ReferenceDataMixin, viewsets.ReadOnlyModelViewSet):
     """Для отображения ингредиента."""
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = [permissions.AllowAny]
-    filter_backends = [rf_filters.DjangoFilterBackend]
     pagination_class = None
-    filterset_class = IngredientFilter
+
+    def list(self, request, *args, **kwargs):
+        """Автодополнение по индексу в памяти, без запросов к БД."""
+        params = IngredientSearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        name = params.validated_data.get('name', '')
+        limit = params.validated_data.get('limit')
+        if not name and limit is None:
+            return super().list(request, *args, **kwargs)
+        return Response(ingredient_index.get().search(name, limit))
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    RecipeResponseCacheMixin, CursorPaginationMixin, viewsets.ModelViewSet
+):
     """Для отображения рецепта."""
 
     http_method_names = ['get', 'post', 'patch', 'delete']
     queryset = Recipe.objects.all()
+    pagination_class = CachedCountPaginator
+    count_version = RECIPE_COUNTS_VERSION
+    parser_classes = [ORJSONParser, MultipartJsonParser]
     permission_classes = [
         permissions.IsAuthenticatedOrReadOnly,
         IsAuthorOrReadOnly,
@@ -173,11 +225,42 @@ class RecipeViewSet(viewsets.ModelViewSet):
     ]
     filter_backends = [
         rf_filters.DjangoFilterBackend,
-        filters.SearchFilter, filters.OrderingFilter
+        filters.OrderingFilter, RecipeSearchFilter,
     ]
     filterset_class = RecipeFilter
-    search_fields = ['name', 'author__username']
-    ordering_fields = ['name', 'pub_date']
+    ordering_fields = ['name', 'pub_date', 'favorites_count']
+    ordering = ('-pub_date', '-id')
+    # Чтение списка, рецепта и ленты идёт по строкам values(), без моделей.
+    card_actions = ('list', 'retrieve', 'feed')
+
+    def get_queryset(self):
+        user = self.request.user
+        if self.action in self.card_actions:
+            return Recipe.objects.with_user_flags(user).values(
+                *CARD_FIELDS, *(
+                    ('favorited', 'in_shopping_cart')
+                    if user.is_authenticated else ()
+                ),
+            )
+        return (
+            Recipe.objects
+            .with_user_flags(user)
+            .prefetch_related(
+                Prefetch(
+                    'author',
+                    queryset=User.objects.with_is_subscribed(user),
+                ),
+                'tags',
+                Prefetch(
+                    'recipeingredients',
+                    queryset=(
+                        RecipeIngredient.objects
+                        .select_related('ingredient')
+                        .order_by('pk')
+                    ),
+                ),
+            )
+        )
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -188,12 +271,28 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action in ['create', 'partial_update']:
             return RecipeWriteSerializer
+        if self.action in self.card_actions:
+            return RecipeCardSerializer
         return RecipeSerializer
 
-    def create_delete_or_scold(self, model, recipe, request):
-        instance = model.objects.filter(recipe=recipe, user=request.user)
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Ошибки всегда в JSON, даже если запрошен файл списка покупок."""
+        if getattr(response, 'exception', False) and not isinstance(
+            getattr(request, 'accepted_renderer', None), BrowsableAPIRenderer,
+        ):
+            request.accepted_renderer = ORJSONRenderer()
+            request.accepted_media_type = ORJSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def create_delete_or_scold(self, model, pk, request):
+        """
+        Добавляет или удаляет рецепт одним запросом на запись,
+        ответ выбирается по числу затронутых строк.
+        """
         if request.method == 'DELETE':
-            if not instance.exists():
+            if not remove_relation(model, recipe_id=pk, user=request.user):
+                if not Recipe.objects.filter(id=pk).exists():
+                    raise Http404
                 content = {
                     'errors': 'Этого рецепта нет в вашем списке.'
                 }
@@ -201,10 +300,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
                     content,
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            instance.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
 
-        if instance.exists():
+        recipe = get_object_or_404(Recipe, id=pk)
+        if add_relation(
+            model, user_id=request.user.pk, recipe_id=recipe.pk,
+        ) is None:
             content = {
                 'errors': 'Этот рецепт уже был в вашем списке.'
             }
@@ -212,8 +313,6 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 content,
                 status=status.HTTP_400_BAD_REQUEST
             )
-
-        model.objects.create(user=request.user, recipe=recipe)
         serializer = RecipeLightSerializer(
             recipe,
             context=self.get_serializer_context()
@@ -228,8 +327,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         ]
     )
     def favorite(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-        return self.create_delete_or_scold(FavoriteRecipe, recipe, request)
+        return self.create_delete_or_scold(FavoriteRecipe, pk, request)
 
     @action(
         methods=['post', 'delete'],
@@ -239,66 +337,107 @@ class RecipeViewSet(viewsets.ModelViewSet):
         ]
     )
     def shopping_cart(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-        return self.create_delete_or_scold(ShoppingList, recipe, request)
+        return self.create_delete_or_scold(ShoppingList, pk, request)
+
+    def bulk_create_delete(self, model, request):
+        """
+        Добавляет или удаляет список рецептов одним запросом на запись
+        и возвращает результат для каждого id.
+        """
+        params = RecipeIdsSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        ids = params.validated_data['ids']
+        found = set(
+            Recipe.objects.filter(id__in=ids).values_list('id', flat=True)
+        )
+        if request.method == 'DELETE':
+            changed = remove_relation(
+                model, user=request.user, recipe_id__in=found,
+            )
+            done, unchanged = 'deleted', 'not_in_list'
+        else:
+            changed = add_relations(model, [
+                {'user_id': request.user.pk, 'recipe_id': pk}
+                for pk in ids if pk in found
+            ])
+            done, unchanged = 'created', 'already_in_list'
+        changed = {instance.recipe_id for instance in changed}
+        return Response({'results': [
+            {
+                'id': pk,
+                'status': (
+                    done if pk in changed
+                    else unchanged if pk in found
+                    else 'not_found'
+                ),
+            }
+            for pk in ids
+        ]})
 
     @action(
+        methods=['post', 'delete'],
         detail=False,
-        permission_classes=[permissions.IsAuthenticated]
+        url_path='favorite',
+        url_name='favorite-bulk',
+        permission_classes=[permissions.IsAuthenticated],
     )
-    def download_shopping_cart(self, request):
-        shopping_list = (
-            RecipeIngredient.objects
-            .filter(recipe__shopping_list__user=request.user)
-            .order_by('ingredient')
-            .prefetch_related('ingredient', 'recipe')
-            .values(
-                'ingredient__name',
-                'ingredient__measurement_unit',
-                'recipe__name', 'amount'
-            )
-            .annotate(total=Sum('amount'))
-        )
+    def favorite_bulk(self, request):
+        return self.bulk_create_delete(FavoriteRecipe, request)
 
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = (
-            'attachment; filename="Ваш_список_покупок.pdf"'
-        )
+    @action(
+        methods=['post', 'delete'],
+        detail=False,
+        url_path='shopping_cart',
+        url_name='shopping-cart-bulk',
+        permission_classes=[permissions.IsAuthenticated],
+    )
+    def shopping_cart_bulk(self, request):
+        return self.bulk_create_delete(ShoppingList, request)
 
-        pdfmetrics.registerFont(TTFont(
-            'Xolonium-Regular', 'Xolonium-Regular.ttf'
-        ))
-        styles = getSampleStyleSheet()
-        header_style = styles['Heading1']
-        header_style.fontName = 'Xolonium-Regular'
-        header_style.fontSize = HEADER_FONT_SIZE
-        body_style = styles['BodyText']
-        body_style.fontName = 'Xolonium-Regular'
-        body_style.fontSize = BODY_FONT_SIZE
-
-        doc = SimpleDocTemplate(response, pagesize=A4)
-        bullet_style = ParagraphStyle(
-            'Bullet', parent=body_style,
-            leftIndent=LEFT_INDENT,
-            bulletIndent=BULLET_INDENT,
-            fontSize=BODY_FONT_SIZE,
-            fontName="Xolonium-Regular",
+    @action(
+        detail=False,
+        permission_classes=[permissions.IsAuthenticated],
+    )
+    def feed(self, request):
+        """Рецепты авторов из подписок пользователя, новые сверху."""
+        paginator = FeedPaginator()
+        recipe_ids = paginator.paginate_feed(request, get_feed)
+        rows = {
+            row['id']: row for row in
+            self.get_queryset().filter(pk__in=recipe_ids).order_by()
+        }
+        serializer = self.get_serializer(
+            [rows[pk] for pk in recipe_ids if pk in rows], many=True,
         )
+        return paginator.get_paginated_response(serializer.data)
 
-        story = []
-
-        header_text = 'Ваш список покупок:'
-        header = Paragraph(header_text, header_style)
-        story.append(header)
-
-        for item in shopping_list:
-            name = item['ingredient__name']
-            unit = item['ingredient__measurement_unit']
-            total = item['total']
-            line = f"• {name} - {total} {unit}"
-
-            line = Paragraph(line, bullet_style)
-            story.append(line)
-
-        doc.build(story)
+    @action(
+        detail=False,
+        permission_classes=[permissions.IsAuthenticated],
+        renderer_classes=[*EXPORT_RENDERERS, ORJSONRenderer],
+    )
+    def download_shopping_cart(self, request):
+        """Выгрузка списка покупок в формате pdf, txt, csv или json."""
+        export_format = request.accepted_renderer.format
+        version = get_version(SHOPPING_CART_VERSION.format(request.user.pk))
+        etag = f'"{version}-{export_format}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            if export_format == 'pdf':
+                response = HttpResponse(
+                    get_shopping_list_pdf(request.user, version),
+                    content_type='application/pdf',
+                )
+            else:
+                exporter, content_type = EXPORTERS[export_format]
+                response = StreamingHttpResponse(
+                    exporter(get_shopping_list(request.user)),
+                    content_type=content_type,
+                )
+            response['Content-Disposition'] = (
+                'attachment; '
+                f'filename="Ваш_список_покупок.{export_format}"'
+            )
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
         return response
@@ -1,6 +1,8 @@
 from django.conf import settings
 from django.contrib import admin
 
+from utils.admin import FastChangeListMixin, id_filter
+
 from .models import (FavoriteRecipe, Ingredient, Recipe, RecipeIngredient,
                      ShoppingList, Tag)
 
@@ -29,14 +31,13 @@ class IngredientAdmin(admin.ModelAdmin):
     list_display = ('pk', 'name', 'measurement_unit',)
     list_display_links = ('name',)
     search_fields = ('name',)
-    list_filter = ('name',)
     list_per_page = settings.LIST_SLICE
     empty_value_display = '-пусто-'
     ordering = ('pk',)
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(FastChangeListMixin, admin.ModelAdmin):
     """Кастомизация кабинета администратора для модели Recipe."""
 
     list_display = (
@@ -53,7 +54,11 @@ class RecipeAdmin(admin.ModelAdmin):
         'author__email', 'author__first_name',
         'author__last_name',
     )
-    list_filter = ('name', 'pub_date', 'author', 'tags',)
+    list_filter = (
+        'pub_date', id_filter('author_id', 'id автора'), 'tags',
+    )
+    list_select_related = ('author',)
+    autocomplete_fields = ('author',)
     readonly_fields = [
         'total_favorites',
         'get_username_author'
@@ -64,9 +69,10 @@ class RecipeAdmin(admin.ModelAdmin):
 
     @admin.display(
         description='Кол-во добавлений в избранное',
+        ordering='favorites_count',
     )
     def total_favorites(self, obj):
-        return obj.favorite_recipe.count()
+        return obj.favorites_count
 
     @admin.display(
         description='Логин автора',
@@ -76,7 +82,7 @@ class RecipeAdmin(admin.ModelAdmin):
 
 
 @admin.register(RecipeIngredient)
-class RecipeIngredientAdmin(admin.ModelAdmin):
+class RecipeIngredientAdmin(FastChangeListMixin, admin.ModelAdmin):
     """Кастомизация кабинета администратора для модели RecipeIngredient."""
 
     list_display = (
@@ -86,14 +92,19 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
     search_fields = (
         'recipe__name', 'ingredient__name',
     )
-    list_filter = ('recipe', 'ingredient',)
+    list_filter = (
+        id_filter('recipe_id', 'id рецепта'),
+        id_filter('ingredient_id', 'id ингредиента'),
+    )
+    list_select_related = ('recipe', 'ingredient',)
+    autocomplete_fields = ('recipe', 'ingredient',)
     list_per_page = settings.LIST_SLICE
     empty_value_display = '-пусто-'
     ordering = ('pk',)
 
 
 @admin.register(FavoriteRecipe)
-class FavoriteRecipeAdmin(admin.ModelAdmin):
+class FavoriteRecipeAdmin(FastChangeListMixin, admin.ModelAdmin):
     """Кастомизация кабинета администратора для модели FavoriteRecipe."""
 
     list_display = (
@@ -105,7 +116,12 @@ class FavoriteRecipeAdmin(admin.ModelAdmin):
         'user__first_name', 'user__last_name',
         'recipe__name'
     ]
-    list_filter = ('recipe', 'user',)
+    list_filter = (
+        id_filter('recipe_id', 'id рецепта'),
+        id_filter('user_id', 'id пользователя'),
+    )
+    list_select_related = ('recipe', 'user',)
+    autocomplete_fields = ('recipe', 'user',)
     list_per_page = settings.LIST_SLICE
     empty_value_display = '-пусто-'
     ordering = ('pk',)
@@ -118,7 +134,7 @@ class FavoriteRecipeAdmin(admin.ModelAdmin):
 
 
 @admin.register(ShoppingList)
-class ShoppingListAdmin(admin.ModelAdmin):
+class ShoppingListAdmin(FastChangeListMixin, admin.ModelAdmin):
     """Кастомизация кабинета администратора для модели ShoppingList."""
 
     list_display = (
@@ -130,7 +146,12 @@ class ShoppingListAdmin(admin.ModelAdmin):
         'user__first_name', 'user__last_name',
         'recipe__name'
     ]
-    list_filter = ('recipe', 'user',)
+    list_filter = (
+        id_filter('recipe_id', 'id рецепта'),
+        id_filter('user_id', 'id пользователя'),
+    )
+    list_select_related = ('recipe', 'user',)
+    autocomplete_fields = ('recipe', 'user',)
     list_per_page = settings.LIST_SLICE
     empty_value_display = '-пусто-'
     ordering = ('pk',)
@@ -0,0 +1,92 @@
+from collections import Counter, defaultdict
+
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+
+from users.models import Follow, User
+from utils.response_cache import RECIPE_COUNTERS_TAG, invalidate
+
+from .models import FavoriteRecipe, Recipe, ShoppingList
+
+# (модель связи, поле связи, модель со счётчиком, поле счётчика)
+COUNTERS = (
+    (FavoriteRecipe, 'recipe_id', Recipe, 'favorites_count'),
+    (ShoppingList, 'recipe_id', Recipe, 'in_carts_count'),
+    (Recipe, 'author_id', User, 'recipes_count'),
+    (Follow, 'author_id', User, 'followers_count'),
+)
+COUNTER_MODELS = {relation for relation, _, _, _ in COUNTERS}
+COUNTER_TARGETS = {target for _, _, target, _ in COUNTERS}
+BATCH_SIZE: int = 1000
+
+
+def counters_changed(target):
+    """
+    Счётчики меняются через update() без сигналов, а от счётчиков
+    рецептов зависят списки с сортировкой по избранному.
+    """
+    if target is Recipe:
+        invalidate(RECIPE_COUNTERS_TAG)
+
+
+def relations_changed(model, instances, delta, deleted=None):
+    """
+    Меняет счётчики для созданных (delta > 0) или удалённых (delta < 0)
+    строк модели связи. Используется сигналами и массовыми операциями,
+    которые сигналы не отправляют. deleted - {модель: pk} строк,
+    удаляемых вместе со связями: их счётчики не меняются.
+    """
+    instances = list(instances)
+    deleted = deleted or {}
+    for relation, field_name, target, counter in COUNTERS:
+        if relation is not model:
+            continue
+        skipped = deleted.get(target, ())
+        changes = defaultdict(list)
+        for pk, count in Counter(
+            getattr(instance, field_name) for instance in instances
+        ).items():
+            if pk not in skipped:
+                changes[count * delta].append(pk)
+        for change, pks in changes.items():
+            target.objects.filter(pk__in=pks).update(**{
+                counter: Greatest(F(counter) + change, Value(0)),
+            })
+        if changes:
+            counters_changed(target)
+
+
+def rebuild_counters(counters=COUNTERS, batch_size=BATCH_SIZE, fix=True):
+    """
+    Пересчитывает счётчики пачками и возвращает расхождения
+    в виде (модель, pk, поле, было, стало). При fix=False
+    только проверяет.
+    """
+    mismatches = []
+    for relation, field_name, target, counter in counters:
+        pks = list(target.objects.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(pks), batch_size):
+            batch = pks[start:start + batch_size]
+            actual = dict(
+                relation.objects
+                .filter(**{f'{field_name}__in': batch})
+                .order_by()
+                .values(field_name)
+                .annotate(total=Count('pk'))
+                .values_list(field_name, 'total')
+            )
+            stale = []
+            for pk, stored in (
+                target.objects
+                .filter(pk__in=batch)
+                .values_list('pk', counter)
+            ):
+                if stored != actual.get(pk, 0):
+                    mismatches.append(
+                        (target, pk, counter, stored, actual.get(pk, 0))
+                    )
+                    stale.append(target(pk=pk, **{counter: actual.get(pk, 0)}))
+            if fix and stale:
+                target.objects.bulk_update(stale, [counter])
+                counters_changed(target)
+    return mismatches
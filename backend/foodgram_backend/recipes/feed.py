@@ -0,0 +1,165 @@
+from collections import Counter
+from heapq import merge
+from itertools import islice
+
+from django.db.models import Q
+
+from users.models import Follow, User
+from utils.background import submit_on_commit
+from utils.constants import (FEED_BACKFILL_LIMIT, FEED_BATCH_SIZE,
+                             FEED_FANOUT_MAX_FOLLOWERS)
+
+from .models import FeedEntry, Recipe
+
+
+def fan_out(author_id, recipes):
+    """Раскладывает рецепты (id, pub_date) по лентам подписчиков автора."""
+    follower_ids = (
+        Follow.objects
+        .filter(author_id=author_id)
+        .values_list('user_id', flat=True)
+        .iterator(chunk_size=FEED_BATCH_SIZE)
+    )
+    while True:
+        batch = list(islice(follower_ids, FEED_BATCH_SIZE))
+        if not batch:
+            return
+        FeedEntry.objects.bulk_create(
+            [
+                FeedEntry(
+                    user_id=user_id, recipe_id=recipe_id,
+                    author_id=author_id, pub_date=pub_date,
+                )
+                for user_id in batch
+                for recipe_id, pub_date in recipes
+            ],
+            ignore_conflicts=True,
+            batch_size=FEED_BATCH_SIZE,
+        )
+
+
+def fan_out_recipe(recipe_id):
+    """Fan-out on write: новый рецепт попадает в ленты подписчиков."""
+    recipe = (
+        Recipe.objects
+        .filter(
+            pk=recipe_id,
+            author__followers_count__lte=FEED_FANOUT_MAX_FOLLOWERS,
+        )
+        .values('pk', 'author_id', 'pub_date')
+        .first()
+    )
+    if recipe is not None:
+        fan_out(recipe['author_id'], [(recipe['pk'], recipe['pub_date'])])
+
+
+def author_unfollowed(author_id, removed):
+    """
+    Автор опустился до порога fan-out: его последние рецепты,
+    которые до этого читались при открытии ленты, раскладываются
+    по лентам подписчиков, иначе они пропали бы из лент.
+    """
+    followers_count = (
+        User.objects
+        .filter(pk=author_id)
+        .values_list('followers_count', flat=True)
+        .first()
+    )
+    if followers_count is None or not (
+        followers_count <= FEED_FANOUT_MAX_FOLLOWERS
+        < followers_count + removed
+    ):
+        return
+    fan_out(author_id, list(
+        Recipe.objects
+        .filter(author_id=author_id)
+        .order_by('-pub_date', '-id')
+        .values_list('pk', 'pub_date')[:FEED_BACKFILL_LIMIT]
+    ))
+
+
+def backfill_feed(user_id, author_id):
+    """После подписки в ленту добавляются последние рецепты автора."""
+    if not Follow.objects.filter(
+        user_id=user_id, author_id=author_id,
+        author__followers_count__lte=FEED_FANOUT_MAX_FOLLOWERS,
+    ).exists():
+        return
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=user_id, recipe_id=recipe_id,
+                author_id=author_id, pub_date=pub_date,
+            )
+            for recipe_id, pub_date in (
+                Recipe.objects
+                .filter(author_id=author_id)
+                .order_by('-pub_date', '-id')
+                .values_list('pk', 'pub_date')[:FEED_BACKFILL_LIMIT]
+            )
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def clear_feed(user_id, author_id):
+    """После отписки рецепты автора убираются из ленты."""
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        return
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def follows_changed(follows, delta):
+    """Обновляет ленты в фоне после подписок (delta > 0) и отписок."""
+    task = backfill_feed if delta > 0 else clear_feed
+    for follow in follows:
+        submit_on_commit(task, follow.user_id, follow.author_id)
+    if delta < 0:
+        for author_id, removed in Counter(
+            follow.author_id for follow in follows
+        ).items():
+            submit_on_commit(author_unfollowed, author_id, removed)
+
+
+def after(queryset, position, recipe_field):
+    """Строки строго после позиции (pub_date, id) в порядке убывания."""
+    if position is None:
+        return queryset
+    pub_date, recipe_id = position
+    return queryset.filter(
+        Q(pub_date__lt=pub_date)
+        | Q(pub_date=pub_date, **{f'{recipe_field}__lt': recipe_id}),
+        pub_date__lte=pub_date,
+    )
+
+
+def get_feed(user, limit, position=None):
+    """
+    Следующие limit позиций (pub_date, id рецепта) ленты после position.
+    Разложенные записи читаются диапазоном индекса, рецепты авторов
+    с fan-out on read - напрямую, и обе выборки сливаются.
+    """
+    entries = after(
+        FeedEntry.objects.filter(user=user), position, 'recipe_id',
+    ).order_by('-pub_date', '-recipe_id').values_list(
+        'pub_date', 'recipe_id'
+    )[:limit]
+    large_authors = list(
+        User.objects
+        .filter(
+            following__user=user,
+            followers_count__gt=FEED_FANOUT_MAX_FOLLOWERS,
+        )
+        .values_list('pk', flat=True)
+    )
+    if not large_authors:
+        return list(entries)
+    recipes = after(
+        Recipe.objects.filter(author_id__in=large_authors), position, 'id',
+    ).order_by('-pub_date', '-id').values_list('pub_date', 'id')[:limit]
+    feed = []
+    for item in merge(entries, recipes, reverse=True):
+        # Рецепт мог попасть в ленту, пока автор был небольшим.
+        if not feed or feed[-1] != item:
+            feed.append(item)
+    return feed[:limit]
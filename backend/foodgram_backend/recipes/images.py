@@ -0,0 +1,106 @@
+import io
+import posixpath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from utils.background import submit_on_commit
+from utils.constants import IMAGE_VARIANT_FORMATS, IMAGE_VARIANTS
+from utils.response_cache import RECIPE_TAG, RECIPES_TAG, invalidate
+
+from .models import MediaBlob, Recipe
+
+VARIANTS_DIR: str = 'recipes/variants'
+
+
+def variant_name(source, variant, extension):
+    """Имя файла варианта однозначно определяется исходным файлом."""
+    stem = posixpath.splitext(posixpath.basename(source))[0]
+    return f'{VARIANTS_DIR}/{stem}_{variant}.{extension}'
+
+
+def variants_are_current(variants, source):
+    return bool(source) and variants.get('source') == source
+
+
+def render_variant(image, size, image_format, options):
+    variant = image.copy()
+    variant.thumbnail(size, Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    variant.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def generate_image_variants(recipe_id, force=False):
+    """
+    Создаёт уменьшенные копии изображения рецепта в JPEG и WebP.
+    Повторный вызов для того же изображения ничего не пересоздаёт.
+    """
+    recipe = (
+        Recipe.objects
+        .filter(pk=recipe_id)
+        .only('image', 'image_variants')
+        .first()
+    )
+    if recipe is None or not recipe.image:
+        return
+    source = recipe.image.name
+    if not force and variants_are_current(recipe.image_variants, source):
+        return
+    with default_storage.open(source, 'rb') as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image = image.convert('RGB')
+    variants = {'source': source}
+    for variant, size in IMAGE_VARIANTS.items():
+        variants[variant] = {}
+        for extension, (image_format, options) in (
+            IMAGE_VARIANT_FORMATS.items()
+        ):
+            name = variant_name(source, variant, extension)
+            if force and default_storage.exists(name):
+                default_storage.delete(name)
+            if not default_storage.exists(name):
+                name = default_storage.save(name, ContentFile(
+                    render_variant(image, size, image_format, options)
+                ))
+            variants[variant][extension] = name
+    if Recipe.objects.filter(pk=recipe_id, image=source).update(
+        image_variants=variants,
+    ):
+        invalidate(RECIPES_TAG, RECIPE_TAG.format(recipe_id))
+
+
+def delete_image_variants(source):
+    """
+    Удаляет варианты изображения. Они общие для всех рецептов
+    с тем же файлом, поэтому удаляются вместе с самим файлом.
+    """
+    for variant in IMAGE_VARIANTS:
+        for extension in IMAGE_VARIANT_FORMATS:
+            default_storage.delete(variant_name(source, variant, extension))
+
+
+def change_image_references(name, delta):
+    """Меняет число ссылок на файл в контентно-адресуемом хранилище."""
+    if not name:
+        return
+    if delta > 0:
+        MediaBlob.objects.bulk_create(
+            [MediaBlob(name=name)], ignore_conflicts=True,
+        )
+    MediaBlob.objects.filter(name=name).update(
+        references=Greatest(F('references') + delta, Value(0)),
+        updated_at=timezone.now(),
+    )
+
+
+def schedule_image_variants(recipe):
+    """Ставит генерацию вариантов в фон, если изображение изменилось."""
+    if recipe.image and not variants_are_current(
+        recipe.image_variants, recipe.image.name
+    ):
+        submit_on_commit(generate_image_variants, recipe.pk)
@@ -1,16 +1,98 @@
+from django.core.cache import cache
 from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
 
-from recipes.models import Ingredient, Tag
+from recipes.models import Ingredient, MediaBlob, Recipe, Tag
 from users.models import User
 
 MODELS = (User, Ingredient, Tag)
 
 
+def get_dependent_models(models):
+    """
+    Модели, строки которых удаляются вместе с models,
+    в порядке внешних ключей: сначала зависимые.
+    """
+    ordered = []
+    visited = set()
+
+    def visit(model):
+        model = model._meta.concrete_model
+        if model in visited or not model._meta.managed:
+            return
+        visited.add(model)
+        for relation in model._meta.related_objects:
+            visit(
+                relation.through if relation.many_to_many
+                else relation.related_model
+            )
+        for field in model._meta.local_many_to_many:
+            visit(field.remote_field.through)
+        ordered.append(model)
+
+    for model in models:
+        visit(model)
+    return ordered
+
+
 class Command(BaseCommand):
     """Для очистики БД."""
 
     help = 'Для очистки БД.'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--truncate', action='store_true',
+            help=(
+                'Очистить таблицы целиком одной транзакцией, '
+                'без загрузки строк в память и сигналов.'
+            ),
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, сколько строк будет удалено.',
+        )
+
     def handle(self, *args, **options):
-        for model in MODELS:
-            model.objects.all().delete()
+        models = get_dependent_models(MODELS)
+        if options['dry_run']:
+            for model in models:
+                self.stdout.write(
+                    f'{model._meta.db_table}: '
+                    f'{model._base_manager.count()}'
+                )
+            return
+        if not options['truncate']:
+            for model in MODELS:
+                model.objects.all().delete()
+            return
+        self.truncate(models)
+        self.stdout.write(self.style.SUCCESS(
+            f'Очищено таблиц: {len(models)}.'
+        ))
+
+    def truncate(self, models):
+        """
+        TRUNCATE ... RESTART IDENTITY CASCADE на PostgreSQL,
+        на SQLite - DELETE в порядке внешних ключей и сброс sqlite_sequence.
+        """
+        statements = connection.ops.sql_flush(
+            no_style(),
+            [model._meta.db_table for model in models],
+            reset_sequences=True,
+            # На SQLite каскад собирает таблицы во множество и теряет
+            # порядок, а зависимые таблицы здесь уже перечислены.
+            allow_cascade=connection.vendor == 'postgresql',
+        )
+        with transaction.atomic():
+            connection.ops.execute_sql_flush(statements)
+            if Recipe in models:
+                # Файлы изображений остаются на диске, их удалит gcmedia.
+                MediaBlob.objects.update(
+                    references=0, updated_at=timezone.now(),
+                )
+        # Сигналы при очистке не срабатывают, поэтому версии и счётчики
+        # в кэше сбрасываются целиком.
+        cache.clear()
@@ -0,0 +1,88 @@
+import posixpath
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.images import VARIANTS_DIR, delete_image_variants
+from recipes.models import MediaBlob, Recipe
+from utils.storage import content_addressed_storage
+
+GRACE_HOURS: int = 24
+IMAGES_DIR: str = 'recipes'
+
+
+class Command(BaseCommand):
+    """Для удаления изображений, на которые не осталось ссылок."""
+
+    help = (
+        'Удаляет файлы контентно-адресуемого хранилища без ссылок '
+        'и их варианты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=int, default=GRACE_HOURS,
+            help='Не трогать файлы, изменённые за последние N часов.',
+        )
+        parser.add_argument(
+            '--orphans', action='store_true',
+            help='Дополнительно удалить файлы, которых нет в учёте ссылок.',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено.',
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        removed = 0
+        for blob in MediaBlob.objects.filter(
+            references=0, updated_at__lt=cutoff,
+        ).iterator():
+            if self.dry_run or MediaBlob.objects.filter(
+                pk=blob.pk, references=0,
+            ).delete()[0]:
+                self.remove(blob.name)
+                removed += 1
+        if options['orphans']:
+            removed += self.remove_orphans(cutoff)
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Будет удалено" if self.dry_run else "Удалено"} '
+            f'файлов: {removed}.'
+        ))
+
+    def remove(self, name):
+        self.stdout.write(name)
+        if not self.dry_run:
+            content_addressed_storage.delete(name)
+            delete_image_variants(name)
+
+    def remove_orphans(self, cutoff):
+        """Файлы на диске, на которые не ссылаются ни учёт, ни рецепты."""
+        known = set(
+            MediaBlob.objects.filter(references__gt=0)
+            .values_list('name', flat=True)
+        )
+        known.update(Recipe.objects.values_list('image', flat=True))
+        removed = 0
+        for name in self.walk(IMAGES_DIR):
+            if (
+                name not in known
+                and content_addressed_storage.get_modified_time(name) < cutoff
+            ):
+                self.remove(name)
+                removed += 1
+        return removed
+
+    def walk(self, directory):
+        if not content_addressed_storage.exists(directory):
+            return
+        directories, files = content_addressed_storage.listdir(directory)
+        for name in files:
+            yield posixpath.join(directory, name)
+        for name in directories:
+            path = posixpath.join(directory, name)
+            if path != VARIANTS_DIR:
+                yield from self.walk(path)
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import generate_image_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Для создания вариантов изображений уже загруженных рецептов."""
+
+    help = 'Создаёт уменьшенные копии изображений рецептов в JPEG и WebP.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать варианты, даже если они актуальны.',
+        )
+
+    def handle(self, *args, **options):
+        recipe_ids = list(
+            Recipe.objects
+            .exclude(image='')
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        failed = 0
+        for number, recipe_id in enumerate(recipe_ids, start=1):
+            try:
+                generate_image_variants(recipe_id, force=options['force'])
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'Рецепт {recipe_id}: {error}')
+            if number % 100 == 0:
+                self.stdout.write(f'Обработано {number} из {len(recipe_ids)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {len(recipe_ids) - failed}, с ошибками: {failed}.'
+        ))
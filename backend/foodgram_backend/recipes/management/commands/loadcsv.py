@@ -1,43 +1,266 @@
 import csv
+import json
 import os
-import sys
+import time
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import UniqueConstraint
 
 from foodgram_backend.settings import STATIC_CSV_JSON_FILES_DIRS
 from recipes.models import Ingredient, Tag
+from recipes.signals import REFERENCE_DATA_VERSION
+from utils.cache import bump_version
 
 DICT_FILE = {
     Ingredient: 'ingredients.csv',
     Tag: 'tags.csv',
 }
+BATCH_SIZE: int = 5000
+FORMATS = ('csv', 'json', 'jsonl')
+# Ключи ON CONFLICT для справочников. Составное unique_tag не годится:
+# строка с новым цветом тега нарушила бы уникальность slug и name.
+NATURAL_KEYS = {
+    Ingredient: ['name', 'measurement_unit'],
+    Tag: ['slug'],
+}
+
+
+def get_unique_fields(model):
+    """
+    Естественный ключ модели: ключ из NATURAL_KEYS, первое составное
+    ограничение уникальности, иначе первое уникальное поле.
+    """
+    if model in NATURAL_KEYS:
+        return NATURAL_KEYS[model]
+    for constraint in model._meta.constraints:
+        if (
+            isinstance(constraint, UniqueConstraint)
+            and constraint.fields
+            and constraint.condition is None
+        ):
+            return list(constraint.fields)
+    for fields in model._meta.unique_together:
+        return list(fields)
+    for field in model._meta.concrete_fields:
+        if field.unique and not field.primary_key:
+            return [field.name]
+    return [model._meta.pk.name]
 
 
 class Command(BaseCommand):
-    """Для выгрузки данных в БД из csv."""
-
-    help = 'Команда вы выгрузки тестовых данных в БД из .csv.'
-
-    def open_csv_file(self, csv_file):
-        """Для открытия, прочитывания csv-файлов."""
-        file_path = os.path.join(STATIC_CSV_JSON_FILES_DIRS, csv_file)
-        try:
-            with open(
-                file_path, newline='', encoding='utf-8'
-            ) as open_csv_file:
-                return list(csv.DictReader(open_csv_file, delimiter=','))
-        except (FileNotFoundError, IsADirectoryError) as error:
-            print(error)
-            sys.exit()
-
-    def load_to_bd(self, model, data):
-        """Для выгрузки данных в БД."""
-        list_data: list = list()
-        for data_item in data:
-            list_data.append(model(**data_item))
-        model.objects.bulk_create(list_data)
-        list_data.clear()
+    """Для загрузки данных в БД из csv и json."""
+
+    help = (
+        'Загружает справочники в БД из .csv, .json или .jsonl. '
+        'Существующие записи обновляются по естественному ключу, '
+        'поэтому команду можно запускать повторно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files', nargs='*',
+            help='Файлы для загрузки. По умолчанию - ингредиенты и теги.',
+        )
+        parser.add_argument(
+            '--model',
+            help='Модель для файлов в виде app_label.Model.',
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат файлов. По умолчанию - по расширению.',
+        )
+        parser.add_argument(
+            '--delimiter', default=',',
+            help='Разделитель полей csv.',
+        )
+        parser.add_argument(
+            '--unique-fields',
+            help='Поля ключа через запятую вместо естественного ключа.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько строк записывать за один запрос.',
+        )
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY на PostgreSQL.',
+        )
 
     def handle(self, *args, **options):
-        for key, value in DICT_FILE.items():
-            self.load_to_bd(key, self.open_csv_file(value))
+        self.options = options
+        if options['files']:
+            if not options['model']:
+                raise CommandError('Для файлов нужно указать --model.')
+            try:
+                model = apps.get_model(options['model'])
+            except (LookupError, ValueError) as error:
+                raise CommandError(error)
+            sources = [(model, path) for path in options['files']]
+        else:
+            sources = [
+                (model, os.path.join(STATIC_CSV_JSON_FILES_DIRS, name))
+                for model, name in DICT_FILE.items()
+            ]
+        for model, path in sources:
+            self.load_file(model, path)
+        bump_version(REFERENCE_DATA_VERSION)
+
+    def load_file(self, model, path):
+        if not os.path.isfile(path):
+            raise CommandError(f'Файл {path} не найден.')
+        file_format = (
+            self.options['format']
+            or os.path.splitext(path)[1].lstrip('.').lower()
+        )
+        if file_format not in FORMATS:
+            raise CommandError(f'Неизвестный формат файла {path}.')
+        unique_fields = (
+            self.options['unique_fields'].split(',')
+            if self.options['unique_fields'] else get_unique_fields(model)
+        )
+        started = time.perf_counter()
+        with transaction.atomic():
+            if (
+                file_format == 'csv'
+                and connection.vendor == 'postgresql'
+                and not self.options['no_copy']
+            ):
+                total = self.copy_csv(model, path, unique_fields)
+            else:
+                total = self.load_rows(
+                    model, self.read_rows(path, file_format), unique_fields,
+                    started,
+                )
+        elapsed = time.perf_counter() - started
+        if self.stdout.isatty():
+            self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'{model._meta.label} из {os.path.basename(path)}: '
+            f'{total} строк за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-6):.0f} строк/с).'
+        ))
+
+    def read_rows(self, path, file_format):
+        """csv и jsonl читаются построчно, json - целиком."""
+        with open(path, newline='', encoding='utf-8') as file:
+            if file_format == 'csv':
+                yield from csv.DictReader(
+                    file, delimiter=self.options['delimiter']
+                )
+            elif file_format == 'jsonl':
+                for line in file:
+                    if line.strip():
+                        yield json.loads(line)
+            else:
+                yield from json.load(file)
+
+    def get_fields(self, model, columns):
+        fields = {}
+        for field in model._meta.concrete_fields:
+            fields[field.name] = fields[field.attname] = field
+        unknown = set(columns) - fields.keys()
+        if unknown:
+            raise CommandError(
+                f'У модели {model._meta.label} нет полей {sorted(unknown)}.'
+            )
+        return {column: fields[column] for column in columns}
+
+    def load_rows(self, model, rows, unique_fields, started):
+        """Записывает строки пачками через INSERT ... ON CONFLICT."""
+        total = 0
+        rows = iter(rows)
+        batch = list(islice(rows, self.options['batch_size']))
+        if not batch:
+            return total
+        fields = self.get_fields(model, batch[0])
+        update_fields = [
+            field.name for column, field in fields.items()
+            if not field.primary_key and field.name not in unique_fields
+        ]
+        key_attnames = [
+            model._meta.get_field(name).attname for name in unique_fields
+        ]
+        while batch:
+            objects = {}
+            for row in batch:
+                instance = model(**{
+                    fields[column].attname: fields[column].to_python(value)
+                    for column, value in row.items()
+                })
+                # В одном INSERT ... ON CONFLICT ключ не должен повторяться.
+                objects[tuple(
+                    getattr(instance, attname) for attname in key_attnames
+                )] = instance
+            if update_fields:
+                model.objects.bulk_create(
+                    objects.values(), update_conflicts=True,
+                    unique_fields=unique_fields, update_fields=update_fields,
+                )
+            else:
+                model.objects.bulk_create(
+                    objects.values(), ignore_conflicts=True,
+                )
+            total += len(batch)
+            self.progress(model, total, started)
+            batch = list(islice(rows, self.options['batch_size']))
+        return total
+
+    def progress(self, model, total, started):
+        if not self.stdout.isatty():
+            return
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{model._meta.label}: {total} строк, '
+            f'{total / max(elapsed, 1e-6):.0f} строк/с',
+            ending='\r',
+        )
+        self.stdout.flush()
+
+    def copy_csv(self, model, path, unique_fields):
+        """
+        Быстрый путь PostgreSQL: COPY во временную таблицу
+        и один INSERT ... ON CONFLICT из неё в основную.
+        """
+        delimiter = self.options['delimiter']
+        with open(path, newline='', encoding='utf-8') as file:
+            columns = next(csv.reader(file, delimiter=delimiter), [])
+        fields = self.get_fields(model, columns)
+        quote = connection.ops.quote_name
+        table = quote(model._meta.db_table)
+        staging = quote(f'{model._meta.db_table}_staging')
+        column_list = ', '.join(
+            quote(field.column) for field in fields.values()
+        )
+        key = ', '.join(
+            quote(model._meta.get_field(name).column)
+            for name in unique_fields
+        )
+        updates = ', '.join(
+            f'{quote(field.column)} = EXCLUDED.{quote(field.column)}'
+            for field in fields.values()
+            if not field.primary_key and field.name not in unique_fields
+        )
+        conflict = f'DO UPDATE SET {updates}' if updates else 'DO NOTHING'
+        delimiter = delimiter.replace("'", "''")
+        with connection.cursor() as cursor, open(
+            path, newline='', encoding='utf-8'
+        ) as file:
+            cursor.execute(
+                f'CREATE TEMP TABLE {staging} ON COMMIT DROP AS '
+                f'SELECT {column_list} FROM {table} WITH NO DATA'
+            )
+            cursor.copy_expert(
+                f'COPY {staging} ({column_list}) FROM STDIN WITH '
+                f"(FORMAT csv, HEADER true, DELIMITER '{delimiter}')",
+                file,
+            )
+            total = cursor.rowcount
+            cursor.execute(
+                f'INSERT INTO {table} ({column_list}) '
+                f'SELECT DISTINCT ON ({key}) {column_list} FROM {staging} '
+                f'ON CONFLICT ({key}) {conflict}'
+            )
+        return total
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.counters import BATCH_SIZE, rebuild_counters
+
+
+class Command(BaseCommand):
+    """Для пересчёта денормализованных счётчиков."""
+
+    help = (
+        'Пересчитывает счётчики избранного, списков покупок, '
+        'рецептов и подписчиков.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только проверить счётчики, ничего не меняя.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько строк обрабатывать за один запрос.',
+        )
+
+    def handle(self, *args, **options):
+        mismatches = rebuild_counters(
+            batch_size=options['batch_size'], fix=not options['check'],
+        )
+        for model, pk, counter, stored, actual in mismatches:
+            self.stdout.write(
+                f'{model._meta.label} {pk}: {counter} {stored} -> {actual}'
+            )
+        if options['check'] and mismatches:
+            raise CommandError(f'Расхождений: {len(mismatches)}.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счётчиков: {len(mismatches)}.'
+            if not options['check'] else 'Счётчики совпадают.'
+        ))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.search import get_search_backend, update_search_documents
+
+BATCH_SIZE: int = 500
+
+
+class Command(BaseCommand):
+    """Для пересборки поискового индекса рецептов."""
+
+    help = 'Пересчитывает поисковые документы и перестраивает индекс.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько рецептов обрабатывать за один запрос.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        recipe_ids = list(
+            Recipe.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        for start in range(0, len(recipe_ids), batch_size):
+            update_search_documents(
+                recipe_ids[start:start + batch_size], refresh=False
+            )
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано рецептов: {len(recipe_ids)} '
+            f'({type(backend).__name__}).'
+        ))
@@ -0,0 +1,83 @@
+# Generated by Django 4.2.2 on 2026-10-18 02:51
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+CREATE_POSTGRES_SEARCH = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    "ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector "
+    "GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(search_document, '')), 'B')"
+    ") STORED",
+    'CREATE INDEX recipe_search_vector_idx '
+    'ON recipes_recipe USING GIN (search_vector)',
+    'CREATE INDEX recipe_search_document_trgm_idx '
+    'ON recipes_recipe USING GIN (search_document gin_trgm_ops)',
+)
+DROP_POSTGRES_SEARCH = (
+    'DROP INDEX IF EXISTS recipe_search_document_trgm_idx',
+    'DROP INDEX IF EXISTS recipe_search_vector_idx',
+    'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector',
+)
+
+
+def compose_document(name, text, author, ingredients):
+    """Снимок recipes.search.compose_document на момент миграции."""
+    document = ' '.join((name, text, author, *ingredients))
+    return document.casefold().replace('ё', 'е')
+
+
+def fill_search_documents(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ingredients = defaultdict(list)
+    for recipe_id, name in (
+        RecipeIngredient.objects
+        .order_by('pk')
+        .values_list('recipe_id', 'ingredient__name')
+    ):
+        ingredients[recipe_id].append(name)
+    recipes = [
+        Recipe(
+            pk=pk,
+            search_document=compose_document(
+                name, text, author, ingredients[pk]
+            ),
+        )
+        for pk, name, text, author in Recipe.objects.values_list(
+            'pk', 'name', 'text', 'author__username'
+        )
+    ]
+    Recipe.objects.bulk_update(recipes, ['search_document'], batch_size=500)
+
+
+def run_postgres(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            for statement in statements:
+                schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Название, описание, автор и ингредиенты для поиска', verbose_name='Поисковый документ'),
+        ),
+        migrations.RunPython(
+            fill_search_documents, migrations.RunPython.noop,
+        ),
+        migrations.RunPython(
+            run_postgres(CREATE_POSTGRES_SEARCH),
+            run_postgres(DROP_POSTGRES_SEARCH),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.2 on 2026-10-18 02:55
+
+from django.db import migrations, models
+from django.db.models import Count
+
+BATCH_SIZE = 1000
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User = apps.get_model('users', 'User')
+    counters = (
+        (apps.get_model('recipes', 'FavoriteRecipe'), 'recipe_id',
+         Recipe, 'favorites_count'),
+        (apps.get_model('recipes', 'ShoppingList'), 'recipe_id',
+         Recipe, 'in_carts_count'),
+        (Recipe, 'author_id', User, 'recipes_count'),
+        (apps.get_model('users', 'Follow'), 'author_id',
+         User, 'followers_count'),
+    )
+    for relation, field_name, target, counter in counters:
+        pks = list(target.objects.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(pks), BATCH_SIZE):
+            batch = pks[start:start + BATCH_SIZE]
+            actual = dict(
+                relation.objects
+                .filter(**{f'{field_name}__in': batch})
+                .order_by()
+                .values(field_name)
+                .annotate(total=Count('pk'))
+                .values_list(field_name, 'total')
+            )
+            target.objects.bulk_update(
+                [
+                    target(pk=pk, **{counter: total})
+                    for pk, total in actual.items()
+                ],
+                [counter],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_search_document'),
+        ('users', '0003_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Кол-во добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Кол-во добавлений в список покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.2 on 2026-10-18 03:00
+
+from django.db import migrations, models
+import utils.storage
+
+
+def fill_media_blobs(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    MediaBlob = apps.get_model('recipes', 'MediaBlob')
+    MediaBlob.objects.bulk_create(
+        MediaBlob(name=name, references=references)
+        for name, references in (
+            Recipe.objects
+            .exclude(image='')
+            .order_by()
+            .values('image')
+            .annotate(references=models.Count('pk'))
+            .values_list('image', 'references')
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Путь к файлу')),
+                ('references', models.PositiveIntegerField(default=0, verbose_name='Кол-во ссылок')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Медиафайл',
+                'verbose_name_plural': 'Медиафайлы',
+                'ordering': ('name',),
+            },
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(help_text='Загрузите изображение блюда', storage=utils.storage.get_content_addressed_storage, upload_to='recipes/', verbose_name='Изображение блюда'),
+        ),
+        migrations.RunPython(fill_media_blobs, migrations.RunPython.noop),
+    ]
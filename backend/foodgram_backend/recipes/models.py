@@ -1,9 +1,12 @@
 from django.core.validators import (MaxValueValidator, MinValueValidator,
                                     RegexValidator)
 from django.db import models
+from django.db.models.functions import RowNumber
 
 from users.models import User
 from utils.constants import AMOUNT_CHAR_TO_SLICE
+from utils.models import CounterFieldsMixin, TrackedFieldsMixin
+from utils.storage import get_content_addressed_storage
 
 
 class Tag(models.Model):
@@ -94,7 +97,45 @@ class Ingredient(models.Model):
         )
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    """QuerySet рецептов с аннотациями для текущего пользователя."""
+
+    def with_user_flags(self, user):
+        """Добавляет флаги избранного и списка покупок через EXISTS."""
+        if not user.is_authenticated:
+            return self
+        return self.annotate(
+            favorited=models.Exists(
+                FavoriteRecipe.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+            in_shopping_cart=models.Exists(
+                ShoppingList.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+        )
+
+    def top_per_author(self, limit=None):
+        """
+        Последние limit рецептов каждого автора одним запросом
+        через оконную функцию ROW_NUMBER().
+        """
+        if limit is None:
+            return self
+        return self.annotate(
+            author_row_number=models.Window(
+                RowNumber(),
+                partition_by=models.F('author_id'),
+                order_by=(
+                    models.F('pub_date').desc(), models.F('pk').desc()
+                ),
+            )
+        ).filter(author_row_number__lte=limit)
+
+
+class Recipe(CounterFieldsMixin, TrackedFieldsMixin, models.Model):
     """Модель для рецепта."""
 
     name = models.CharField(
@@ -126,9 +167,17 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         upload_to='recipes/',
+        storage=get_content_addressed_storage,
         verbose_name='Изображение блюда',
         help_text='Загрузите изображение блюда'
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты изображения',
+        help_text='Пути к уменьшенным копиям изображения в JPEG и WebP'
+    )
     text = models.TextField(
         verbose_name='Описание рецепта',
         help_text='Задайте описание рецепта'
@@ -146,6 +195,28 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Кол-во добавлений в избранное',
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Кол-во добавлений в список покупок',
+    )
+    search_document = models.TextField(
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='Поисковый документ',
+        help_text='Название, описание, автор и ингредиенты для поиска'
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    counter_fields = ('favorites_count', 'in_carts_count')
+    tracked_fields = ('author', 'name', 'text', 'image')
 
     def is_favorited(self, user):
         return self.favorite_recipe.filter(user=user).exists()
@@ -166,6 +237,12 @@ class Recipe(models.Model):
                 name='unique_author_name'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx',
+            ),
+        ]
 
 
 class RecipeIngredient(models.Model):
@@ -283,3 +360,85 @@ class ShoppingList(models.Model):
         """Для вывода строкового представления."""
         return (f'Покупка рецепта {self.recipe[:AMOUNT_CHAR_TO_SLICE]} '
                 f'пользователем {self.user}.')
+
+
+class MediaBlob(models.Model):
+    """
+    Файл в контентно-адресуемом хранилище и число ссылок на него.
+    Файлы без ссылок удаляет команда gcmedia.
+    """
+
+    name = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='Путь к файлу',
+    )
+    references = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Кол-во ссылок',
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
+
+    class Meta:
+        ordering = ('name',)
+        verbose_name = 'Медиафайл'
+        verbose_name_plural = 'Медиафайлы'
+
+    def __str__(self) -> str:
+        return f'{self.name} ({self.references})'
+
+
+class FeedEntry(models.Model):
+    """
+    Рецепт в ленте подписчика. Заполняется в фоне при публикации
+    рецепта и при подписке, читается по индексу (user, pub_date, recipe).
+    """
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Подписчик',
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор рецепта',
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации рецепта',
+    )
+
+    class Meta:
+        ordering = ('-pub_date', '-recipe_id')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='feed_user_author_idx',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'Рецепт {self.recipe_id} в ленте {self.user_id}'
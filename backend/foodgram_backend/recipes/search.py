@@ -0,0 +1,260 @@
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, Case, FloatField, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from utils.cache import bump_version, get_version
+from utils.text import normalize
+
+from .models import Recipe, RecipeIngredient
+
+SEARCH_INDEX_VERSION = 'recipe_search:version'
+DEFAULT_BACKENDS = {
+    'postgresql': 'recipes.search.PostgresSearchBackend',
+}
+WORD_RE = re.compile(r'\w+')
+ENDINGS = sorted(
+    (
+        'ами', 'ями', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ах', 'ях',
+        'ой', 'ей', 'ый', 'ий', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ов',
+        'ев', 'ам', 'ям', 'ом', 'ем', 'ую', 'юю', 'а', 'я', 'о', 'е', 'ы',
+        'и', 'у', 'ю', 'ь', 'й',
+    ),
+    key=len,
+    reverse=True,
+)
+MIN_STEM_LENGTH: int = 3
+NAME_WEIGHT: int = 2
+
+
+def compose_document(name, text, author, ingredients):
+    """Собирает поисковый документ рецепта."""
+    return normalize(' '.join((name, text, author, *ingredients)))
+
+
+def update_search_documents(recipe_ids, refresh=True):
+    """Пересчитывает поисковые документы рецептов и обновляет индекс."""
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+    ingredients = defaultdict(list)
+    for recipe_id, name in (
+        RecipeIngredient.objects
+        .filter(recipe_id__in=recipe_ids)
+        .order_by('pk')
+        .values_list('recipe_id', 'ingredient__name')
+    ):
+        ingredients[recipe_id].append(name)
+    recipes = [
+        Recipe(
+            pk=pk,
+            search_document=compose_document(
+                name, text, author, ingredients[pk]
+            ),
+        )
+        for pk, name, text, author in (
+            Recipe.objects
+            .filter(pk__in=recipe_ids)
+            .values_list('pk', 'name', 'text', 'author__username')
+        )
+    ]
+    Recipe.objects.bulk_update(recipes, ['search_document'])
+    if refresh:
+        get_search_backend().refresh(recipe_ids)
+
+
+def stem(word):
+    """Грубая основа слова: отбрасывает типичное окончание."""
+    for ending in ENDINGS:
+        if (
+            word.endswith(ending)
+            and len(word) - len(ending) >= MIN_STEM_LENGTH
+        ):
+            return word[:-len(ending)]
+    return word
+
+
+def stems(value):
+    return {stem(word) for word in WORD_RE.findall(normalize(value))}
+
+
+class BaseSearchBackend:
+    """Интерфейс поискового бэкенда рецептов."""
+
+    def search(self, queryset, query):
+        """
+        Оставляет в queryset найденные рецепты
+        и добавляет аннотацию search_rank.
+        """
+        raise NotImplementedError
+
+    def refresh(self, recipe_ids):
+        """Вызывается после изменения поисковых документов рецептов."""
+
+    def rebuild(self):
+        """Перестраивает индекс целиком."""
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Полнотекстовый поиск PostgreSQL: tsvector с конфигурацией russian
+    и триграммы по поисковому документу. Колонка search_vector
+    генерируется базой, поэтому обновлять индекс отдельно не нужно.
+    """
+
+    def search(self, queryset, query):
+        table = connection.ops.quote_name(Recipe._meta.db_table)
+        document = normalize(query)
+        return queryset.filter(
+            RawSQL(
+                f"{table}.search_vector @@ "
+                f"websearch_to_tsquery('russian', %s) "
+                f"OR %s <%% {table}.search_document",
+                (query, document),
+                output_field=BooleanField(),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f"ts_rank({table}.search_vector, "
+                f"websearch_to_tsquery('russian', %s)) "
+                f"+ word_similarity(%s, {table}.search_document)",
+                (query, document),
+                output_field=FloatField(),
+            )
+        )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'ANALYZE {connection.ops.quote_name(Recipe._meta.db_table)}'
+            )
+
+
+class InvertedIndex:
+    """Инвертированный индекс в памяти: основа слова -> веса рецептов."""
+
+    def __init__(self, documents):
+        self.postings = defaultdict(dict)
+        self.documents = {}
+        for pk, name, document in documents:
+            self.add(pk, name, document, sort=False)
+        self.keys = sorted(self.postings)
+
+    def add(self, pk, name, document, sort=True):
+        weights = dict.fromkeys(stems(document), 1)
+        weights.update(dict.fromkeys(stems(name), NAME_WEIGHT))
+        self.documents[pk] = weights
+        for key, weight in weights.items():
+            if sort and key not in self.postings:
+                insort(self.keys, key)
+            self.postings[key][pk] = weight
+
+    def remove(self, pk):
+        for key in self.documents.pop(pk, ()):
+            self.postings[key].pop(pk, None)
+
+    def lookup(self, key):
+        """Рецепты, в которых есть слова, начинающиеся с основы key."""
+        found = {}
+        position = bisect_left(self.keys, key)
+        while (
+            position < len(self.keys)
+            and self.keys[position].startswith(key)
+        ):
+            for pk, weight in self.postings[self.keys[position]].items():
+                found[pk] = max(found.get(pk, 0), weight)
+            position += 1
+        return found
+
+    def search(self, query):
+        """Рецепты, содержащие все слова запроса, с их весом."""
+        scores = None
+        for key in stems(query):
+            found = self.lookup(key)
+            if scores is None:
+                scores = found
+            else:
+                scores = {
+                    pk: score + found[pk]
+                    for pk, score in scores.items()
+                    if pk in found
+                }
+            if not scores:
+                break
+        return scores or {}
+
+
+class InMemorySearchBackend(BaseSearchBackend):
+    """
+    Инвертированный индекс в памяти процесса для SQLite и тестов.
+    Изменения рецептов применяются к индексу процесса на месте,
+    остальные процессы перестраивают индекс при смене версии.
+    """
+
+    def __init__(self):
+        self.index = None
+        self.version = None
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def documents(queryset):
+        return queryset.values_list('pk', 'name', 'search_document')
+
+    def get_index(self):
+        version = get_version(SEARCH_INDEX_VERSION)
+        with self.lock:
+            if self.index is None or self.version != version:
+                self.index = InvertedIndex(
+                    self.documents(Recipe.objects.order_by())
+                )
+                self.version = version
+            return self.index
+
+    def search(self, queryset, query):
+        with self.lock:
+            scores = self.get_index().search(query)
+        if not scores:
+            return queryset.annotate(
+                search_rank=Value(0, output_field=FloatField())
+            ).none()
+        return queryset.filter(pk__in=scores).annotate(
+            search_rank=Case(
+                *(When(pk=pk, then=Value(score))
+                  for pk, score in scores.items()),
+                default=Value(0),
+                output_field=FloatField(),
+            )
+        )
+
+    def refresh(self, recipe_ids):
+        with self.lock:
+            if self.index is not None:
+                for pk in recipe_ids:
+                    self.index.remove(pk)
+                for document in self.documents(
+                    Recipe.objects.filter(pk__in=recipe_ids)
+                ):
+                    self.index.add(*document)
+            bump_version(SEARCH_INDEX_VERSION)
+            self.version = get_version(SEARCH_INDEX_VERSION)
+
+    def rebuild(self):
+        with self.lock:
+            self.index = None
+            bump_version(SEARCH_INDEX_VERSION)
+
+
+@lru_cache
+def get_search_backend():
+    """Бэкенд из настройки RECIPE_SEARCH_BACKEND или по типу базы."""
+    path = settings.RECIPE_SEARCH_BACKEND or DEFAULT_BACKENDS.get(
+        connection.vendor, 'recipes.search.InMemorySearchBackend'
+    )
+    return import_string(path)()
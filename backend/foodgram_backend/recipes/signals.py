@@ -0,0 +1,211 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from users.models import Follow, User
+from utils.background import schedule_on_commit, submit_on_commit
+from utils.cache import bump_version
+
+from .counters import COUNTER_MODELS, COUNTER_TARGETS, relations_changed
+from .feed import fan_out_recipe, follows_changed
+from .images import change_image_references, schedule_image_variants
+from .models import Ingredient, Recipe, RecipeIngredient, ShoppingList, Tag
+from .search import update_search_documents
+
+SHOPPING_CART_VERSION = 'shopping_cart:version:{}'
+REFERENCE_DATA_VERSION = 'reference_data:version'
+
+
+def invalidate_shopping_carts(recipe_ids):
+    """Сбрасывает версии списков покупок, в которых есть рецепты."""
+    user_ids = (
+        ShoppingList.objects
+        .filter(recipe_id__in=recipe_ids)
+        .order_by()
+        .values_list('user_id', flat=True)
+        .distinct()
+    )
+    bump_version(*(SHOPPING_CART_VERSION.format(pk) for pk in user_ids))
+
+
+class RelationsUpdate:
+    """
+    Удаления связей и изменения ингредиентов за транзакцию.
+    Массовое и каскадное удаление отправляет сигнал на каждую строку,
+    а счётчики, списки покупок и ленты обновляются один раз,
+    без строк, которые удаляются вместе со связями.
+    """
+
+    def __init__(self):
+        self.relations = defaultdict(list)
+        self.deleted = defaultdict(set)
+        self.recipe_ids = set()
+
+    def add(self, instance, deleting=False):
+        model = type(instance)
+        if deleting:
+            self.deleted[model].add(instance.pk)
+        elif model is RecipeIngredient:
+            self.recipe_ids.add(instance.recipe_id)
+        else:
+            self.relations[model].append(instance)
+
+    def __call__(self):
+        deleted_users = self.deleted[User]
+        if self.relations:
+            with transaction.atomic():
+                for model, instances in self.relations.items():
+                    relations_changed(model, instances, -1, self.deleted)
+        follows_changed(
+            [
+                follow for follow in self.relations[Follow]
+                if follow.user_id not in deleted_users
+                and follow.author_id not in deleted_users
+            ],
+            -1,
+        )
+        bump_version(*{
+            SHOPPING_CART_VERSION.format(item.user_id)
+            for item in self.relations[ShoppingList]
+            if item.user_id not in deleted_users
+        })
+        recipe_ids = self.recipe_ids - self.deleted[Recipe]
+        if recipe_ids:
+            invalidate_shopping_carts(recipe_ids)
+
+
+@receiver(post_save, sender=ShoppingList)
+def shopping_list_changed(sender, instance, **kwargs):
+    bump_version(SHOPPING_CART_VERSION.format(instance.user_id))
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    schedule_on_commit(RelationsUpdate, instance)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+def reference_data_changed(sender, instance, **kwargs):
+    bump_version(REFERENCE_DATA_VERSION)
+
+
+class SearchUpdate:
+    """Отложенное обновление поисковых документов рецептов."""
+
+    def __init__(self):
+        self.recipe_ids = set()
+
+    def add(self, recipe_ids):
+        self.recipe_ids.update(recipe_ids)
+
+    def __call__(self):
+        update_search_documents(self.recipe_ids)
+
+
+def schedule_search_update(recipe_ids):
+    """
+    Обновляет поисковые документы после фиксации транзакции,
+    один раз на все рецепты, изменённые в ней.
+    """
+    schedule_on_commit(SearchUpdate, recipe_ids)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    schedule_search_update([instance.pk])
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_previous_image(sender, instance, update_fields=None, **kwargs):
+    """
+    Прежнее имя изображения нужно, только если оно записывается;
+    обычно оно известно из загрузки рецепта и SELECT не нужен.
+    """
+    if instance._state.adding:
+        previous = ''
+    elif update_fields is not None and 'image' not in update_fields:
+        previous = None
+    else:
+        previous = instance.get_loaded_value('image')
+        if previous is None:
+            previous = (
+                Recipe.objects
+                .filter(pk=instance.pk)
+                .values_list('image', flat=True)
+                .first()
+            )
+    instance._previous_image = previous
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, raw=False, **kwargs):
+    previous = instance.__dict__.pop('_previous_image', None)
+    if raw:
+        return
+    if previous is not None and instance.image.name != previous:
+        change_image_references(instance.image.name, 1)
+        change_image_references(previous, -1)
+    schedule_image_variants(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_image_deleted(sender, instance, **kwargs):
+    change_image_references(instance.image.name, -1)
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def recipe_ingredient_search_changed(sender, instance, **kwargs):
+    schedule_search_update([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_renamed(sender, instance, created, **kwargs):
+    if not created:
+        schedule_search_update(
+            instance.recipeingredients.values_list('recipe_id', flat=True)
+        )
+
+
+@receiver(post_save, sender=User)
+def author_renamed(sender, instance, created, update_fields=None, **kwargs):
+    if created or 'username' not in instance.get_changed_fields(update_fields):
+        return
+    schedule_search_update(
+        instance.recipes.values_list('pk', flat=True)
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        submit_on_commit(fan_out_recipe, instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        follows_changed([instance], 1)
+
+
+def relation_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        relations_changed(sender, [instance], 1)
+
+
+def relation_deleted(sender, instance, **kwargs):
+    schedule_on_commit(RelationsUpdate, instance)
+
+
+def target_deleting(sender, instance, **kwargs):
+    schedule_on_commit(RelationsUpdate, instance, True)
+
+
+for model in COUNTER_MODELS:
+    post_save.connect(relation_created, sender=model)
+    post_delete.connect(relation_deleted, sender=model)
+for model in COUNTER_TARGETS:
+    pre_delete.connect(target_deleting, sender=model)
@@ -1,6 +1,8 @@
 from django.conf import settings
 from django.contrib import admin
 
+from utils.admin import FastChangeListMixin, id_filter
+
 from .models import Follow, User
 
 admin.site.site_title = 'Администрирование проекта FoodGram'
@@ -8,13 +10,14 @@ admin.site.site_header = 'Администрирование проекта Food
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(FastChangeListMixin, admin.ModelAdmin):
     """Кастомизация кабинета администратора для модели User."""
 
     list_display = (
         'email', 'username',
         'first_name', 'last_name',
         'date_joined',
+        'recipes_count', 'followers_count',
     )
     list_display_links = ('username',)
     search_fields = (
@@ -22,7 +25,6 @@ class UserAdmin(admin.ModelAdmin):
         'last_name', 'email',
     )
     list_filter = (
-        'username', 'email',
         'is_staff', 'date_joined',
     )
     list_per_page = settings.LIST_SLICE
@@ -31,7 +33,7 @@ class UserAdmin(admin.ModelAdmin):
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(FastChangeListMixin, admin.ModelAdmin):
     """Кастомизация кабинета администратора для модели Follow."""
 
     list_display = (
@@ -49,7 +51,12 @@ class FollowAdmin(admin.ModelAdmin):
         'user__first_name', 'author__first_name',
         'user__last_name', 'author__last_name'
     ]
-    list_filter = ('user', 'author',)
+    list_filter = (
+        id_filter('user_id', 'id подписчика'),
+        id_filter('author_id', 'id автора'),
+    )
+    list_select_related = ('user', 'author',)
+    autocomplete_fields = ('user', 'author',)
     list_per_page = settings.LIST_SLICE
     empty_value_display = '-empty-'
     ordering = ('pk',)
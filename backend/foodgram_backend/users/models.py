@@ -1,11 +1,33 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import UserManager as BaseUserManager
 from django.core.validators import RegexValidator
 from django.db import models
 
 from utils.constants import AMOUNT_CHAR_TO_SLICE
+from utils.models import CounterFieldsMixin, TrackedFieldsMixin
 
 
-class User(AbstractUser):
+class UserQuerySet(models.QuerySet):
+    """QuerySet пользователей с аннотациями для текущего пользователя."""
+
+    def with_is_subscribed(self, user):
+        """Добавляет флаг подписки текущего пользователя через EXISTS."""
+        if not user.is_authenticated:
+            return self
+        return self.annotate(
+            is_subscribed=models.Exists(
+                Follow.objects.filter(
+                    user=user, author=models.OuterRef('pk')
+                )
+            )
+        )
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
+    """Менеджер пользователей с методами UserQuerySet."""
+
+
+class User(CounterFieldsMixin, TrackedFieldsMixin, AbstractUser):
     """Модель пользователя."""
 
     email = models.EmailField(
@@ -50,6 +72,21 @@ class User(AbstractUser):
         blank=False,
         null=False,
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Кол-во рецептов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Кол-во подписчиков',
+    )
+
+    objects = UserManager()
+
+    counter_fields = ('recipes_count', 'followers_count')
+    tracked_fields = ('username',)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -0,0 +1,73 @@
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+from utils.db import estimate_count
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator для админки: для больших таблиц без фильтров
+    берёт количество из статистики планировщика вместо COUNT(*).
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is not None:
+            return estimate
+        return super().count
+
+
+class InputFilter(admin.SimpleListFilter):
+    """
+    Фильтр с полем ввода id вместо списка всех значений:
+    не загружает в боковую панель каждую строку связанной таблицы.
+    """
+
+    template = 'admin/input_filter.html'
+    field_name = None
+
+    def lookups(self, request, model_admin):
+        # Фильтр без вариантов админка не показывает.
+        return ((None, None),)
+
+    def choices(self, changelist):
+        all_choice = next(super().choices(changelist))
+        all_choice['query_parts'] = (
+            (name, value)
+            for name, value in changelist.get_filters_params().items()
+            if name != self.parameter_name
+        )
+        yield all_choice
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value is None:
+            return queryset
+        if not value.isdigit():
+            return queryset.none()
+        return queryset.filter(**{self.field_name: value})
+
+
+def id_filter(field_name, title):
+    """Создаёт InputFilter по id связанного объекта."""
+    return type(
+        f'{field_name.title().replace("_", "")}Filter',
+        (InputFilter,),
+        {
+            'title': title,
+            'parameter_name': field_name,
+            'field_name': field_name,
+        },
+    )
+
+
+class FastChangeListMixin:
+    """
+    Список объектов в админке без полного COUNT(*):
+    без счётчика «показать все» и с оценкой количества строк.
+    """
+
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
@@ -0,0 +1,65 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.BACKGROUND_WORKERS,
+    thread_name_prefix='foodgram-background',
+)
+futures = set()
+
+
+def run(func, *args):
+    """Выполняет задачу в потоке пула и закрывает его соединения с БД."""
+    close_old_connections()
+    try:
+        return func(*args)
+    except Exception:
+        logger.exception('Фоновая задача %s завершилась ошибкой.', func)
+        raise
+    finally:
+        connections.close_all()
+
+
+def submit(func, *args):
+    """Ставит задачу в пул фоновых потоков процесса."""
+    future = executor.submit(run, func, *args)
+    futures.add(future)
+    future.add_done_callback(futures.discard)
+    return future
+
+
+def submit_on_commit(func, *args):
+    """Ставит задачу в пул после фиксации текущей транзакции."""
+    transaction.on_commit(partial(submit, func, *args))
+
+
+def schedule_on_commit(update_class, *args):
+    """
+    Копит работу в одном объекте update_class на транзакцию
+    и выполняет её один раз после фиксации. Работа из точки
+    сохранения копится отдельно и пропадает при её откате.
+    """
+    connection = transaction.get_connection()
+    # None - вложенный atomic без точки сохранения.
+    savepoint_ids = set(connection.savepoint_ids) - {None}
+    for sids, callback, *_ in connection.run_on_commit:
+        if (
+            isinstance(callback, update_class)
+            and sids - {None} == savepoint_ids
+        ):
+            callback.add(*args)
+            return
+    update = update_class()
+    update.add(*args)
+    transaction.on_commit(update)
+
+
+def wait_all(timeout=None):
+    """Дожидается завершения поставленных задач."""
+    wait(list(futures), timeout=timeout)
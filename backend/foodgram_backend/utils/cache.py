@@ -0,0 +1,29 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+
+
+def get_version(name):
+    """Возвращает текущую версию данных с именем name."""
+    version = cache.get(name)
+    if version is None:
+        cache.add(name, uuid4().hex, None)
+        version = cache.get(name)
+    return version
+
+
+def bump_version(*names):
+    """Меняет версии данных, делая недействительными зависимые кэши."""
+    if names:
+        cache.set_many({name: uuid4().hex for name in names}, None)
+
+
+def get_versions(*names):
+    """Текущие версии нескольких данных одним обращением к кэшу."""
+    versions = cache.get_many(names)
+    missing = [name for name in names if name not in versions]
+    if missing:
+        for name in missing:
+            cache.add(name, uuid4().hex, None)
+        versions.update(cache.get_many(missing))
+    return versions
@@ -4,3 +4,32 @@ HEADER_FONT_SIZE: int = 20
 BODY_FONT_SIZE: int = 14
 LEFT_INDENT: int = 15
 BULLET_INDENT: int = 20
+SHOPPING_CART_CACHE_TIMEOUT: int = 60 * 60 * 24
+EXPORT_CHUNK_SIZE: int = 500
+REFERENCE_DATA_MAX_AGE: int = 60 * 60
+COUNT_CACHE_TIMEOUT: int = 30
+ESTIMATE_COUNT_THRESHOLD: int = 100_000
+# Варианты изображения рецепта: имя -> максимальные ширина и высота.
+IMAGE_VARIANTS: dict = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+IMAGE_VARIANT_FORMATS: dict = {
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+}
+# Ограничения на загружаемое изображение рецепта.
+IMAGE_UPLOAD_MAX_SIZE: int = 10 * 2 ** 20
+IMAGE_MAX_SIDE: int = 6000
+UPLOAD_CHUNK_SIZE: int = 64 * 2 ** 10
+RESPONSE_CACHE_TIMEOUT: int = 60
+# Как часто процесс сбрасывает статистику кэша ответов в общий кэш, с.
+RESPONSE_CACHE_STATS_INTERVAL: int = 10
+# Сколько рецептов можно добавить в корзину или избранное одним запросом.
+BULK_RECIPES_MAX: int = 100
+# Лента подписок: у авторов с большим числом подписчиков рецепты
+# не раскладываются по лентам, а читаются при открытии ленты.
+FEED_FANOUT_MAX_FOLLOWERS: int = 10_000
+FEED_BACKFILL_LIMIT: int = 100
+FEED_BATCH_SIZE: int = 1000
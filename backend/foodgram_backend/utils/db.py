@@ -0,0 +1,91 @@
+from django.db import connections, router
+
+from utils.constants import ESTIMATE_COUNT_THRESHOLD
+
+
+def estimate_count(queryset):
+    """
+    Оценка количества строк по статистике планировщика PostgreSQL
+    для больших таблиц без фильтров. В остальных случаях - None.
+    """
+    connection = connections[queryset.db]
+    query = queryset.query
+    if (
+        connection.vendor != 'postgresql'
+        or query.where
+        or query.distinct
+        or query.group_by is not None
+    ):
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class '
+            'WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < ESTIMATE_COUNT_THRESHOLD:
+        return None
+    return row[0]
+
+
+def bulk_insert_ignore_conflicts(model, rows):
+    """
+    INSERT ... ON CONFLICT DO NOTHING RETURNING одним запросом для
+    списка словарей с одинаковыми ключами. Возвращает только созданные
+    объекты: строки, которые уже были, пропускаются.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+    opts = model._meta
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    fields = [opts.get_field(name) for name in rows[0]]
+    params = [
+        field.get_db_prep_save(value, connection)
+        for row in rows
+        for field, value in zip(fields, row.values())
+    ]
+    columns = ', '.join(quote(field.column) for field in fields)
+    values = ', '.join(
+        [f'({", ".join(["%s"] * len(fields))})'] * len(rows)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(opts.db_table)} ({columns}) '
+            f'VALUES {values} ON CONFLICT DO NOTHING '
+            f'RETURNING {quote(opts.pk.column)}, {columns}',
+            params,
+        )
+        created = cursor.fetchall()
+    attnames = [field.attname for field in fields]
+    return [
+        model(pk=row[0], **dict(zip(attnames, row[1:]))) for row in created
+    ]
+
+
+def delete_returning(queryset):
+    """
+    DELETE ... RETURNING одним запросом, без сигналов и каскада.
+    Возвращает удалённые объекты.
+    """
+    model = queryset.model
+    opts = model._meta
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+    pk_column = quote(opts.pk.column)
+    subquery, params = (
+        queryset.order_by().values('pk').query
+        .get_compiler(using=queryset.db).as_sql()
+    )
+    names = [field.attname for field in opts.concrete_fields]
+    columns = ', '.join(quote(field.column) for field in opts.concrete_fields)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(opts.db_table)} '
+            f'WHERE {pk_column} IN ({subquery}) RETURNING {columns}',
+            params,
+        )
+        rows = cursor.fetchall()
+    return [model.from_db(queryset.db, names, row) for row in rows]
@@ -0,0 +1,77 @@
+class CounterFieldsMixin:
+    """
+    Счётчики меняются только атомарными UPDATE, поэтому save()
+    существующей строки записывает их, лишь если они явно указаны
+    в update_fields.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, force_insert=False, update_fields=None, **kwargs):
+        if (
+            update_fields is None
+            and not force_insert
+            and not self._state.adding
+        ):
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(
+            *args, force_insert=force_insert, update_fields=update_fields,
+            **kwargs,
+        )
+
+
+class TrackedFieldsMixin:
+    """
+    Запоминает значения tracked_fields, прочитанные из базы, чтобы
+    сигналы сохранения реагировали только на их фактическое изменение.
+    """
+
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_tracked_fields()
+        return instance
+
+    def save(self, *args, update_fields=None, **kwargs):
+        super().save(*args, update_fields=update_fields, **kwargs)
+        self.remember_tracked_fields(update_fields)
+
+    def get_tracked_value(self, name):
+        field = self._meta.get_field(name)
+        return field.get_prep_value(field.value_from_object(self))
+
+    def remember_tracked_fields(self, update_fields=None):
+        deferred = self.get_deferred_fields()
+        loaded = self.__dict__.setdefault('_loaded_values', {})
+        for name in self.tracked_fields:
+            if update_fields is not None and name not in update_fields:
+                continue
+            if self._meta.get_field(name).attname not in deferred:
+                loaded[name] = self.get_tracked_value(name)
+
+    def get_loaded_value(self, name, default=None):
+        """Значение поля в базе, если оно известно."""
+        return self.__dict__.get('_loaded_values', {}).get(name, default)
+
+    def get_changed_fields(self, update_fields=None):
+        """
+        Отслеживаемые поля, записанные с новым значением. Поле, чьё
+        значение из базы неизвестно, считается изменённым.
+        """
+        loaded = self.__dict__.get('_loaded_values', {})
+        return {
+            name for name in self.tracked_fields
+            if (update_fields is None or name in update_fields)
+            and (
+                name not in loaded
+                or loaded[name] != self.get_tracked_value(name)
+            )
+        }
@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache, caches
+
+from .background import schedule_on_commit
+from .cache import bump_version
+from .constants import RESPONSE_CACHE_STATS_INTERVAL
+
+# Теги зависимостей закэшированных ответов. Тег - это версия в кэше:
+# смена версии делает недействительными все ответы с этим тегом.
+# Рецепт помечен тегами самого рецепта и автора, и его изменение
+# сбрасывает только ответы с ним. Страница списка помечена одним
+# крупным тегом всех рецептов, чтобы проверка записи была одним
+# get_many на несколько ключей, а не на каждый рецепт страницы.
+RESPONSE_CACHE_VERSION = 'response:version'
+RECIPES_TAG = 'response:recipes'
+RECIPE_COUNTERS_TAG = 'response:recipes:counters'
+RECIPE_TAG = 'response:recipe:{}'
+USER_TAG = 'response:user:{}'
+VIEWER_TAG = 'response:viewer:{}'
+STATS_KEY = 'response:stats:{}'
+STATS = ('local_hits', 'shared_hits', 'misses')
+
+
+class Invalidation:
+    """Теги, сброшенные за транзакцию."""
+
+    def __init__(self):
+        self.tags = set()
+
+    def add(self, tags):
+        self.tags.update(tags)
+
+    def __call__(self):
+        bump_version(*self.tags)
+
+
+def invalidate(*tags):
+    """Сбрасывает теги один раз после фиксации текущей транзакции."""
+    schedule_on_commit(Invalidation, tags)
+
+
+class LocalLRU:
+    """Ограниченный по числу записей LRU-кэш в памяти процесса."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class TieredResponseCache:
+    """
+    Двухуровневый кэш ответов: LRU процесса перед общим кэшем
+    RESPONSE_CACHE_ALIAS. Запись хранит версии своих тегов
+    и считается устаревшей, если хотя бы одна из них сменилась.
+    """
+
+    def __init__(self, maxsize):
+        self.local = LocalLRU(maxsize)
+        self.counts = Counter()
+        self.counts_lock = threading.Lock()
+        self.flushed_at = time.monotonic()
+
+    @property
+    def shared(self):
+        return caches[settings.RESPONSE_CACHE_ALIAS]
+
+    @staticmethod
+    def is_fresh(entry):
+        if entry['expires'] < time.time():
+            return False
+        versions = cache.get_many(list(entry['tags']))
+        return all(
+            versions.get(tag) == version
+            for tag, version in entry['tags'].items()
+        )
+
+    def get(self, key):
+        """Возвращает запись и её источник: HIT-LOCAL, HIT или MISS."""
+        entry = self.local.get(key)
+        if entry is not None:
+            if self.is_fresh(entry):
+                self.count('local_hits')
+                return entry, 'HIT-LOCAL'
+            self.local.delete(key)
+        entry = self.shared.get(key)
+        if entry is not None and self.is_fresh(entry):
+            self.local.set(key, entry)
+            self.count('shared_hits')
+            return entry, 'HIT'
+        self.count('misses')
+        return None, 'MISS'
+
+    def set(self, key, entry, timeout):
+        entry['expires'] = time.time() + timeout
+        self.local.set(key, entry)
+        self.shared.set(key, entry, timeout)
+
+    def count(self, name):
+        """
+        Статистика копится в процессе и уходит в общий кэш
+        не чаще раза в RESPONSE_CACHE_STATS_INTERVAL секунд.
+        """
+        with self.counts_lock:
+            self.counts[name] += 1
+            now = time.monotonic()
+            if now - self.flushed_at < RESPONSE_CACHE_STATS_INTERVAL:
+                return
+            counts, self.counts = self.counts, Counter()
+            self.flushed_at = now
+        self.flush_stats(counts)
+
+    @staticmethod
+    def flush_stats(counts):
+        for name, value in counts.items():
+            key = STATS_KEY.format(name)
+            cache.add(key, 0, None)
+            try:
+                cache.incr(key, value)
+            except ValueError:
+                # Статистику обнулили между add и incr.
+                pass
+
+    def stats(self):
+        """Статистика всех процессов, кроме ещё не сброшенной."""
+        values = cache.get_many([STATS_KEY.format(name) for name in STATS])
+        with self.counts_lock:
+            return {
+                name: values.get(STATS_KEY.format(name), 0)
+                + self.counts[name]
+                for name in STATS
+            }
+
+    def reset_stats(self):
+        with self.counts_lock:
+            self.counts.clear()
+        cache.delete_many([STATS_KEY.format(name) for name in STATS])
+
+    def clear(self):
+        """Делает недействительными все ответы во всех процессах."""
+        self.local.clear()
+        bump_version(RESPONSE_CACHE_VERSION)
+
+
+response_cache = TieredResponseCache(settings.RESPONSE_CACHE_LOCAL_SIZE)
@@ -0,0 +1,3 @@
+def normalize(value):
+    """Приводит строку к виду для сравнения: casefold и ё -> е."""
+    return value.casefold().replace('ё', 'е')